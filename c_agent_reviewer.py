@@ -3,20 +3,24 @@
 C言語専用AIエージェント型コードレビューツール CLI
 """
 
+import os
 import sys
+import asyncio
 import time
 import click
+import orjson
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional
 
 # プロジェクトのルートディレクトリをPythonパスに追加
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.agents.code_review_agent import CCodeReviewAgent
-from src.config.config_manager import ConfigManager
-from src.tools.coding_standards_loader import CodingStandardsLoader
-
+# 各コマンドの依存モジュール（LangChain/Ollama、YAML等）はコマンド内で遅延インポートし、
+# 起動コストが定義済みのコマンド数ではなく実行するコマンドにのみ比例するようにする
 
 # ログ設定
 logging.basicConfig(
@@ -26,6 +30,39 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4)
+def _get_agent(config_path: str, llm_model: str = "codellama", verbose: bool = False):
+    """設定パス・モデル・詳細ログ有無ごとにエージェントを1度だけ構築して再利用"""
+    from src.agents.code_review_agent import CCodeReviewAgent
+    
+    return CCodeReviewAgent(config_path, llm_model=llm_model, verbose=verbose)
+
+
+# review-range のワーカープロセスで共有する、Ollamaへの同時アクセス数を制限するセマフォ
+_llm_semaphore = None
+
+
+def _init_review_worker(semaphore):
+    """review-range ワーカープロセスの初期化"""
+    global _llm_semaphore
+    _llm_semaphore = semaphore
+
+
+def _review_one(commit_hash: str, config_path: str, output: str,
+                output_dir: Optional[str], verbose: bool):
+    """ワーカープロセス内で1コミットをレビュー（エージェントはプロセスごとに再利用）"""
+    from src.agents.code_review_agent import LLMConcurrencyCallback
+    
+    agent = _get_agent(config_path, verbose=verbose)
+    if output_dir:
+        agent.report_generator.output_dir = Path(output_dir)
+    
+    start_time = time.time()
+    # セマフォはLLM呼び出しの間だけ保持し、Git操作・静的解析・レポート出力は他のワーカーと並行させる
+    result = agent.review_commit(commit_hash, output, callbacks=[LLMConcurrencyCallback(_llm_semaphore)])
+    return result, time.time() - start_time
+
+
 @click.group()
 @click.option('--config-path', default='.code_review_agent', help='設定ディレクトリのパス')
 @click.option('--verbose', '-v', is_flag=True, help='詳細ログを表示')
@@ -47,10 +84,13 @@ def cli(ctx, config_path: str, verbose: bool):
 @click.pass_context
 def setup(ctx, standards_files: str, project_name: Optional[str], project_type: str):
     """プロジェクトの初期セットアップ"""
+    from src.agents.code_review_agent import CCodeReviewAgent
+    from src.config.config_manager import get_config_manager
+    
     click.echo("🤖 C言語コードレビューエージェントのセットアップを開始します...")
     
     config_path = ctx.obj['config_path']
-    config_manager = ConfigManager(config_path)
+    config_manager = get_config_manager(config_path)
     
     # プロジェクト情報を更新
     if project_name:
@@ -63,7 +103,7 @@ def setup(ctx, standards_files: str, project_name: Optional[str], project_type:
     click.echo(f"📄 コーディング規約ファイルを処理中...")
     
     try:
-        agent = CCodeReviewAgent(config_path)
+        agent = CCodeReviewAgent(config_path, verbose=ctx.obj['verbose'])
         
         if standards_files:
             standards_file_list = [f.strip() for f in standards_files.split(',')]
@@ -112,28 +152,26 @@ def setup(ctx, standards_files: str, project_name: Optional[str], project_type:
 @click.pass_context
 def review(ctx, commit_hash: str, output: str, output_dir: Optional[str], show_summary: bool):
     """指定されたコミットのC言語レビューを実行"""
+    from src.agents.code_review_agent import ReviewProgressCallback
+    
     click.echo(f"🔍 コミット {commit_hash[:8]} のC言語レビューを開始します...")
     
     config_path = ctx.obj['config_path']
     
     try:
-        # エージェントを初期化
-        agent = CCodeReviewAgent(config_path)
+        # エージェントを取得（同一プロセス内では構築済みのものを再利用）
+        agent = _get_agent(config_path, verbose=ctx.obj['verbose'])
         
         # 出力ディレクトリを設定
         if output_dir:
-            agent.tools[-1].output_dir = Path(output_dir)  # ReportGeneratorToolの出力ディレクトリを変更
+            agent.report_generator.output_dir = Path(output_dir)
         
         start_time = time.time()
         
-        # レビュー実行
+        # レビュー実行（ツール呼び出しの完了ごとにプログレスバーを更新）
         with click.progressbar(length=100, label='レビュー実行中') as bar:
-            # プログレスバーの更新（実際のエージェント処理では適切な進捗管理が必要）
-            for i in range(0, 100, 10):
-                time.sleep(0.1)  # 実際の処理時間をシミュレート
-                bar.update(10)
-        
-        result = agent.review_commit(commit_hash, output)
+            progress = ReviewProgressCallback(bar, len(agent.tools))
+            result = asyncio.run(agent.areview_commit(commit_hash, output, callbacks=[progress]))
         
         execution_time = time.time() - start_time
         
@@ -141,62 +179,161 @@ def review(ctx, commit_hash: str, output: str, output_dir: Optional[str], show_s
             click.echo(f"❌ レビューに失敗しました: {result['error']}")
             return
         
-        click.echo(f"✓ レビューが完了しました（実行時間: {execution_time:.2f}秒）")
+        lines = [f"✓ レビューが完了しました（実行時間: {execution_time:.2f}秒）"]
         
         # サマリー表示
         if show_summary:
-            click.echo("\n📊 レビュー結果サマリー:")
-            click.echo(f"  コミット: {commit_hash}")
-            click.echo(f"  ステータス: {result.get('status', 'unknown')}")
+            lines.append("\n📊 レビュー結果サマリー:")
+            lines.append(f"  コミット: {commit_hash}")
+            lines.append(f"  ステータス: {result.get('status', 'unknown')}")
         
         # 生成されたファイルの表示
         if 'generated_files' in result:
-            click.echo("\n📝 生成されたレポート:")
+            lines.append("\n📝 生成されたレポート:")
             for format_type, file_path in result['generated_files'].items():
-                click.echo(f"  {format_type.upper()}: {file_path}")
+                lines.append(f"  {format_type.upper()}: {file_path}")
         
+        click.echo("\n".join(lines))
+        
+    except Exception as e:
+        click.echo(f"❌ エラー: {e}")
+        if ctx.obj['verbose']:
+            import traceback
+            traceback.print_exc()
+
+
+@cli.command()
+@click.option('--output', default='all', help='出力形式 (json/markdown/html/all)')
+@click.option('--output-dir', help='出力ディレクトリ')
+@click.pass_context
+def serve(ctx, output: str, output_dir: Optional[str]):
+    """標準入力から1行ずつコミットハッシュを読み込み、同じエージェントで連続レビュー"""
+    config_path = ctx.obj['config_path']
+    
+    try:
+        agent = _get_agent(config_path, verbose=ctx.obj['verbose'])
     except Exception as e:
         click.echo(f"❌ エラー: {e}")
         if ctx.obj['verbose']:
             import traceback
             traceback.print_exc()
+        return
+    
+    if output_dir:
+        agent.report_generator.output_dir = Path(output_dir)
+    
+    for line in sys.stdin:
+        commit_hash = line.strip()
+        if not commit_hash:
+            continue
+        
+        start_time = time.time()
+        result = agent.review_commit(commit_hash, output)
+        execution_time = time.time() - start_time
+        
+        if "error" in result:
+            click.echo(f"❌ {commit_hash[:8]}: {result['error']}")
+            continue
+        
+        click.echo(f"✓ {commit_hash[:8]}: {result.get('status', 'unknown')}（実行時間: {execution_time:.2f}秒）")
+        for format_type, file_path in result.get('generated_files', {}).items():
+            click.echo(f"  {format_type.upper()}: {file_path}")
+
+
+@cli.command()
+@click.argument('base')
+@click.argument('head', default='HEAD')
+@click.option('--output', default='all', help='出力形式 (json/markdown/html/all)')
+@click.option('--output-dir', help='出力ディレクトリ')
+@click.option('--workers', type=int, help='並列レビュー数（既定: CPU数、最大8）')
+@click.option('--llm-concurrency', default=2, show_default=True, help='Ollamaへの同時リクエスト数の上限')
+@click.pass_context
+def review_range(ctx, base: str, head: str, output: str, output_dir: Optional[str],
+                 workers: Optional[int], llm_concurrency: int):
+    """BASE..HEAD の範囲の各コミットを並列にレビュー"""
+    from git import Repo
+    
+    config_path = ctx.obj['config_path']
+    
+    try:
+        commits = [c.hexsha for c in Repo(".").iter_commits(f"{base}..{head}", reverse=True)]
+    except Exception as e:
+        click.echo(f"❌ コミット範囲を取得できません: {e}")
+        return
+    
+    if not commits:
+        click.echo(f"📄 {base}..{head} にレビュー対象のコミットがありません")
+        return
+    
+    max_workers = min(workers or min(8, os.cpu_count() or 1), len(commits))
+    click.echo(f"🔍 {len(commits)}件のコミットを{max_workers}並列でレビューします...")
+    
+    semaphore = multiprocessing.BoundedSemaphore(llm_concurrency)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_review_worker,
+                             initargs=(semaphore,)) as executor:
+        futures = [
+            executor.submit(_review_one, commit_hash, config_path, output, output_dir, ctx.obj['verbose'])
+            for commit_hash in commits
+        ]
+        
+        # 1件のワーカーで例外が起きても、残りのコミットの結果は表示する
+        for commit_hash, future in zip(commits, futures):
+            try:
+                result, execution_time = future.result()
+            except Exception as e:
+                click.echo(f"❌ {commit_hash[:8]}: エラー: {e}")
+                if ctx.obj['verbose']:
+                    import traceback
+                    traceback.print_exception(type(e), e, e.__traceback__)
+                continue
+            
+            if "error" in result:
+                click.echo(f"❌ {commit_hash[:8]}: {result['error']}")
+                continue
+            
+            click.echo(f"✓ {commit_hash[:8]}: {result.get('status', 'unknown')}（実行時間: {execution_time:.2f}秒）")
+            for format_type, file_path in result.get('generated_files', {}).items():
+                click.echo(f"  {format_type.upper()}: {file_path}")
 
 
 @cli.command()
 @click.pass_context
 def config(ctx):
     """現在の設定を表示"""
+    from src.config.config_manager import get_config_manager
+    
     config_path = ctx.obj['config_path']
-    config_manager = ConfigManager(config_path)
+    config_manager = get_config_manager(config_path)
     
     try:
         current_config = config_manager.get_current_config()
         
-        click.echo("⚙️ 現在の設定:")
-        click.echo(f"設定ディレクトリ: {config_path}")
+        lines = ["⚙️ 現在の設定:", f"設定ディレクトリ: {config_path}"]
         
         # プロジェクト設定
         project = current_config.get('project', {}).get('project', {})
-        click.echo(f"\nプロジェクト:")
-        click.echo(f"  名前: {project.get('name', 'Unknown')}")
-        click.echo(f"  タイプ: {project.get('type', 'Unknown')}")
-        click.echo(f"  言語: {project.get('language_primary', 'Unknown')}")
+        lines.append(f"\nプロジェクト:")
+        lines.append(f"  名前: {project.get('name', 'Unknown')}")
+        lines.append(f"  タイプ: {project.get('type', 'Unknown')}")
+        lines.append(f"  言語: {project.get('language_primary', 'Unknown')}")
         
         # チーム設定
         team = current_config.get('project', {}).get('team', {})
-        click.echo(f"\nチーム設定:")
-        click.echo(f"  レビュー厳格度: {team.get('review_strictness', 'medium')}")
+        lines.append(f"\nチーム設定:")
+        lines.append(f"  レビュー厳格度: {team.get('review_strictness', 'medium')}")
         standards_files = team.get('coding_standards_files', [])
         if standards_files:
-            click.echo(f"  コーディング規約ファイル:")
+            lines.append(f"  コーディング規約ファイル:")
             for file_path in standards_files:
-                click.echo(f"    - {file_path}")
+                lines.append(f"    - {file_path}")
         
         # レビュー観点
         standards = current_config.get('review_standards', {})
-        click.echo(f"\nレビュー観点:")
+        lines.append(f"\nレビュー観点:")
         for category, rules in standards.items():
-            click.echo(f"  {category}: {len(rules)}件")
+            lines.append(f"  {category}: {len(rules)}件")
+        
+        click.echo("\n".join(lines))
         
     except Exception as e:
         click.echo(f"❌ エラー: {e}")
@@ -204,8 +341,9 @@ def config(ctx):
 
 @cli.command()
 @click.option('--period', default='all', help='期間指定 (all/last-week/last-month)')
+@click.option('--limit', default=10, show_default=True, help='表示する最新レポートの件数')
 @click.pass_context
-def list_reports(ctx, period: str):
+def list_reports(ctx, period: str, limit: int):
     """生成されたレポートの一覧を表示"""
     config_path = ctx.obj['config_path']
     
@@ -213,24 +351,30 @@ def list_reports(ctx, period: str):
         from src.tools.report_generator import ReportGeneratorTool
         
         report_generator = ReportGeneratorTool()
-        reports = json.loads(report_generator._run("list_reports"))
+        # 続きの有無を判定するため1件多く取得（絞り込み・並べ替えはツール側で実施）
+        # 同一プロセス内の呼び出しなので、_run を経由したJSONの往復は行わない
+        reports = report_generator._list_reports(limit=limit + 1, period=period)
         
         if not reports:
             click.echo("📄 レポートが見つかりません")
             return
         
-        click.echo(f"📄 レビューレポート一覧 ({len(reports)}件)")
-        click.echo("-" * 80)
+        has_more = len(reports) > limit
+        reports = reports[:limit]
+        
+        lines = [f"📄 レビューレポート一覧 (最新{len(reports)}件)", "-" * 80]
         
-        for report in reports[:10]:  # 最新10件を表示
-            click.echo(f"📄 {report['filename']}")
-            click.echo(f"   コミット: {report['commit_hash']}")
-            click.echo(f"   作成日時: {report['created']}")
-            click.echo(f"   サイズ: {report['size']:,} bytes")
-            click.echo()
+        for report in reports:
+            lines.append(f"📄 {report['filename']}")
+            lines.append(f"   コミット: {report['commit_hash']}")
+            lines.append(f"   作成日時: {report['created']}")
+            lines.append(f"   サイズ: {report['size']:,} bytes")
+            lines.append("")
         
-        if len(reports) > 10:
-            click.echo(f"... 他 {len(reports) - 10}件")
+        if has_more:
+            lines.append("... さらに古いレポートがあります（--limit で表示件数を変更できます）")
+        
+        click.echo("\n".join(lines))
         
     except Exception as e:
         click.echo(f"❌ エラー: {e}")
@@ -242,7 +386,6 @@ def list_reports(ctx, period: str):
 def open_report(ctx, report_path: str):
     """HTMLレポートをブラウザで開く"""
     import webbrowser
-    import os
     
     report_file = Path(report_path)
     
@@ -255,8 +398,7 @@ def open_report(ctx, report_path: str):
         return
     
     try:
-        full_path = os.path.abspath(report_path)
-        webbrowser.open(f"file://{full_path}")
+        webbrowser.open_new_tab(report_file.resolve().as_uri())
         click.echo(f"🌐 ブラウザでレポートを開きました: {report_path}")
     except Exception as e:
         click.echo(f"❌ エラー: {e}")
@@ -269,24 +411,27 @@ def stats(ctx, output_file: Optional[str]):
     """レビュー統計情報を表示"""
     try:
         from src.tools.report_generator import ReportGeneratorTool
-        import json
         
         report_generator = ReportGeneratorTool()
-        stats_result = json.loads(report_generator._run("get_report_stats"))
+        stats_result = report_generator._get_report_stats()
         
-        click.echo("📊 レビュー統計情報:")
-        click.echo(f"  総レポート数: {stats_result['total_reports']}件")
-        click.echo(f"  総サイズ: {stats_result['total_size_mb']:.2f} MB")
-        click.echo(f"  出力ディレクトリ: {stats_result['output_directory']}")
+        lines = [
+            "📊 レビュー統計情報:",
+            f"  総レポート数: {stats_result['total_reports']}件",
+            f"  総サイズ: {stats_result['total_size_mb']:.2f} MB",
+            f"  出力ディレクトリ: {stats_result['output_directory']}"
+        ]
         
         if stats_result['latest_report']:
             latest = stats_result['latest_report']
-            click.echo(f"  最新レポート: {latest['filename']} ({latest['created']})")
+            lines.append(f"  最新レポート: {latest['filename']} ({latest['created']})")
         
         if output_file:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(stats_result, f, ensure_ascii=False, indent=2)
-            click.echo(f"✓ 統計結果を保存しました: {output_file}")
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(stats_result, option=orjson.OPT_INDENT_2))
+            lines.append(f"✓ 統計結果を保存しました: {output_file}")
+        
+        click.echo("\n".join(lines))
         
     except Exception as e:
         click.echo(f"❌ エラー: {e}")
@@ -296,13 +441,15 @@ def stats(ctx, output_file: Optional[str]):
 @click.pass_context
 def version(ctx):
     """バージョン情報を表示"""
-    click.echo("C言語専用AIエージェント型コードレビューツール")
-    click.echo("バージョン: 1.0.0")
-    click.echo("LangChain統合版")
-    click.echo("\n対応ファイル形式:")
-    click.echo("  - コーディング規約: PDF, Markdown (.md), テキスト (.txt)")
-    click.echo("  - レビュー対象: C言語 (.c, .h)")
-    click.echo("  - 出力形式: JSON, Markdown, HTML")
+    click.echo("\n".join([
+        "C言語専用AIエージェント型コードレビューツール",
+        "バージョン: 1.0.0",
+        "LangChain統合版",
+        "\n対応ファイル形式:",
+        "  - コーディング規約: PDF, Markdown (.md), テキスト (.txt)",
+        "  - レビュー対象: C言語 (.c, .h)",
+        "  - 出力形式: JSON, Markdown, HTML"
+    ]))
 
 
 if __name__ == '__main__':
@@ -3,6 +3,8 @@ C言語専用AIエージェント型コードレビューツール
 セットアップスクリプト
 """
 
+import os
+
 from setuptools import setup, find_packages
 
 with open("README.md", "r", encoding="utf-8") as fh:
@@ -11,6 +13,16 @@ with open("README.md", "r", encoding="utf-8") as fh:
 with open("requirements.txt", "r", encoding="utf-8") as fh:
     requirements = [line.strip() for line in fh if line.strip() and not line.startswith("#")]
 
+# C_AGENT_REVIEWER_MYPYC=1 を指定した場合のみ、起動時に必ず読み込まれる設定管理をmypycでネイティブ化する
+# mypycが利用できない環境では純粋なPythonモジュールとしてインストールされる
+ext_modules = []
+if os.environ.get("C_AGENT_REVIEWER_MYPYC") == "1":
+    try:
+        from mypyc.build import mypycify
+        ext_modules = mypycify(["src/config/config_manager.py"])
+    except ImportError:
+        print("mypyc is not available; installing pure-Python modules")
+
 setup(
     name="c-agent-reviewer",
     version="1.0.0",
@@ -19,6 +31,8 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     packages=find_packages(include=['src', 'src.*']),
+    py_modules=["c_agent_reviewer"],
+    ext_modules=ext_modules,
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Developers",
@@ -5,42 +5,120 @@ LangChainベースの自律的なコードレビューエージェント
 
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 
 from langchain.agents import AgentExecutor, create_structured_chat_agent
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.schema import BaseMessage
-from langchain_community.llms import Ollama
-from langchain_community.chat_models import ChatOllama
 
-from ..tools.coding_standards_loader import CodingStandardsLoader
 from ..tools.c_code_parser import CCodeParserTool
 from ..tools.c_static_analyzer import CStaticAnalysisTool
 from ..tools.review_rule_engine import ReviewRuleEngineTool
 from ..tools.local_git_analyzer import LocalGitTool
 from ..tools.report_generator import ReportGeneratorTool
-from ..config.config_manager import ConfigManager
-from ..reports.review_result import CReviewResult
+from ..config.config_manager import get_config_manager
+
+
+# プロンプトは不変のため、インスタンス生成ごとではなくインポート時に一度だけ構築する
+_SYSTEM_PROMPT = """
+        あなたは経験豊富なC言語コードレビューエージェントです。
+        以下の能力を持っています:
+
+        ## 基本方針
+        1. **完全性の保証**: 全ファイル・全セクションを確実にレビュー
+        2. **自律的判断**: 設定に基づいて適切なルールを自動選択・適用
+        3. **C言語特化**: メモリ管理、セキュリティ、パフォーマンスに重点
+        4. **コンテキスト認識**: ファイルの種類・重要度に応じた適切な深度でレビュー
+
+        ## 利用可能なツール
+        - local_git_analyzer: ローカルGitリポジトリの解析
+        - c_code_parser: C言語コードの構造解析
+        - c_static_analyzer: 静的解析ツール(cppcheck等)の実行
+        - review_rule_engine: レビュールールの評価・適用
+        - report_generator: 構造化されたレポートの生成
+
+        ## レビュープロセス
+        1. **Git解析**: 変更内容を分析し、C言語ファイルを特定
+        2. **計画立案**: ファイルの重要度とレビュー戦略を決定
+        3. **静的解析**: cppcheckやカスタム解析を実行
+        4. **詳細レビュー**: 各ファイルを段階的に詳細レビュー
+        5. **品質検証**: レビューの完全性・一貫性をチェック
+        6. **レポート生成**: 構造化された結果を出力
+
+        ## C言語特有の観点
+        - バッファオーバーフロー対策
+        - メモリリークの防止
+        - NULLポインタアクセスのチェック
+        - 危険な関数の使用回避
+        - 適切なエラーハンドリング
+
+        必ず全てのC言語ファイルとセクションを完全にレビューしてください。
+        問題を発見した場合は、具体的なコード例と修正提案を含めて報告してください。
+        """
+
+_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", _SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history", optional=True),
+    ("human", "{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+])
+
+# テキスト結果を構造化する際の雛形
+_OK_TEMPLATE = {"commit_hash": None, "status": "completed", "summary": None, "format": None}
+
+
+class ReviewProgressCallback(BaseCallbackHandler):
+    """ツール呼び出しの完了ごとにプログレスバーを進めるコールバック"""
+    
+    def __init__(self, bar, tool_count: int):
+        self.bar = bar
+        self.step = max(1, bar.length // max(1, tool_count))
+    
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        self.bar.update(self.step)
+
+
+class LLMConcurrencyCallback(BaseCallbackHandler):
+    """LLM呼び出しの間だけセマフォを保持し、プロセス間でのOllamaへの同時リクエスト数を制限するコールバック"""
+    
+    def __init__(self, semaphore):
+        self.semaphore = semaphore
+    
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self.semaphore.acquire()
+    
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        self.semaphore.acquire()
+    
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        self.semaphore.release()
+    
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.semaphore.release()
 
 
 class CCodeReviewAgent:
     """C言語専用LangChainベースのコードレビューエージェント"""
     
-    def __init__(self, config_path: str = None, llm_model: str = "codellama"):
-        self.config_manager = ConfigManager(config_path)
+    def __init__(self, config_path: str = None, llm_model: str = "codellama",
+                 verbose: bool = False, max_iterations: int = 25, use_memory: bool = False):
+        self.config_manager = get_config_manager(config_path)
         self.llm = self._setup_llm(llm_model)
-        self.memory = self._setup_memory()
+        # 単発のCLIレビューでは会話履歴を保持しない（対話的に使う場合のみ有効化）
+        self.memory = self._setup_memory() if use_memory else None
         self.tools = self._setup_tools()
+        self.report_generator = next(t for t in self.tools if isinstance(t, ReportGeneratorTool))
         self.agent = self._create_agent()
         self.executor = AgentExecutor(
             agent=self.agent,
             tools=self.tools,
             memory=self.memory,
-            verbose=True,
+            verbose=verbose,
             handle_parsing_errors=True,
-            max_iterations=50,
+            max_iterations=max_iterations,
             early_stopping_method="generate"
         )
         
@@ -48,13 +126,19 @@ class CCodeReviewAgent:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
-    def _setup_llm(self, model: str) -> ChatOllama:
+    def _setup_llm(self, model: str) -> "ChatOllama":
         """Ollama LLMをセットアップ"""
+        from langchain_community.chat_models import ChatOllama
+        
+        llm_config = self.config_manager.get_llm_config()
         return ChatOllama(
             model=model,
-            base_url="http://localhost:11434",
-            temperature=0.1,
-            num_ctx=4096
+            base_url=llm_config.get("base_url", "http://localhost:11434"),
+            temperature=llm_config.get("temperature", 0.1),
+            num_ctx=llm_config.get("context_window", 4096),
+            # コミット間でモデルがアンロードされ、重みを再読み込みするのを防ぐ
+            keep_alive=llm_config.get("keep_alive", "30m"),
+            timeout=llm_config.get("timeout", 120)
         )
     
     def _setup_memory(self) -> ConversationBufferWindowMemory:
@@ -77,66 +161,26 @@ class CCodeReviewAgent:
     
     def _create_agent(self):
         """構造化チャットエージェントを作成"""
-        system_prompt = """
-        あなたは経験豊富なC言語コードレビューエージェントです。
-        以下の能力を持っています:
-
-        ## 基本方針
-        1. **完全性の保証**: 全ファイル・全セクションを確実にレビュー
-        2. **自律的判断**: 設定に基づいて適切なルールを自動選択・適用
-        3. **C言語特化**: メモリ管理、セキュリティ、パフォーマンスに重点
-        4. **コンテキスト認識**: ファイルの種類・重要度に応じた適切な深度でレビュー
-
-        ## 利用可能なツール
-        - local_git_analyzer: ローカルGitリポジトリの解析
-        - c_code_parser: C言語コードの構造解析
-        - c_static_analyzer: 静的解析ツール(cppcheck等)の実行
-        - review_rule_engine: レビュールールの評価・適用
-        - report_generator: 構造化されたレポートの生成
-
-        ## レビュープロセス
-        1. **Git解析**: 変更内容を分析し、C言語ファイルを特定
-        2. **計画立案**: ファイルの重要度とレビュー戦略を決定
-        3. **静的解析**: cppcheckやカスタム解析を実行
-        4. **詳細レビュー**: 各ファイルを段階的に詳細レビュー
-        5. **品質検証**: レビューの完全性・一貫性をチェック
-        6. **レポート生成**: 構造化された結果を出力
-
-        ## C言語特有の観点
-        - バッファオーバーフロー対策
-        - メモリリークの防止
-        - NULLポインタアクセスのチェック
-        - 危険な関数の使用回避
-        - 適切なエラーハンドリング
-
-        必ず全てのC言語ファイルとセクションを完全にレビューしてください。
-        問題を発見した場合は、具体的なコード例と修正提案を含めて報告してください。
-        """
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad"),
-        ])
-        
         return create_structured_chat_agent(
             llm=self.llm,
             tools=self.tools,
-            prompt=prompt
+            prompt=_PROMPT
         )
     
     def setup_from_files(self, review_standards_files: List[str]) -> bool:
         """レビュー観点ファイルからセットアップ"""
+        # PDF/埋め込み関連の依存はセットアップ時のみ必要なため遅延インポート
+        from ..tools.coding_standards_loader import CodingStandardsLoader
+        
         try:
             loader = CodingStandardsLoader()
             
-            # 各ファイルから観点を読み込み
+            # 各ファイルから観点を並列に読み込み（結果はファイル指定順にマージ）
             all_standards = {}
-            for file_path in review_standards_files:
-                self.logger.info(f"Loading standards from: {file_path}")
-                standards = loader.load_standards_from_file(file_path)
-                all_standards.update(standards)
+            max_workers = max(1, min(8, len(review_standards_files)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for standards in executor.map(loader.load_standards_from_file, review_standards_files):
+                    all_standards.update(standards)
             
             # 設定に保存
             self.config_manager.save_review_standards(all_standards)
@@ -147,13 +191,45 @@ class CCodeReviewAgent:
             self.logger.error(f"Setup failed: {e}")
             return False
     
-    def review_commit(self, commit_hash: str, output_format: str = "all") -> Dict[str, str]:
+    def review_commit(self, commit_hash: str, output_format: str = "all",
+                      callbacks: Optional[List[BaseCallbackHandler]] = None) -> Dict[str, str]:
         """指定されたコミットの完全なC言語レビューを実行"""
         try:
             self.logger.info(f"Starting C code review for commit: {commit_hash}")
             
-            # エージェントへの指示
-            review_instruction = f"""
+            # エージェント実行
+            result = self.executor.invoke(
+                {"input": self._build_review_instruction(commit_hash, output_format)},
+                config={"callbacks": callbacks}
+            )
+            
+            # 結果の解析と整理
+            return self._parse_agent_result(result["output"], commit_hash, output_format)
+            
+        except Exception as e:
+            self.logger.error(f"Review failed: {e}")
+            return {"error": str(e)}
+    
+    async def areview_commit(self, commit_hash: str, output_format: str = "all",
+                             callbacks: Optional[List[BaseCallbackHandler]] = None) -> Dict[str, str]:
+        """review_commit の非同期版（ツールのサブプロセス待ちとLLM推論を重ね合わせる）"""
+        try:
+            self.logger.info(f"Starting C code review for commit: {commit_hash}")
+            
+            result = await self.executor.ainvoke(
+                {"input": self._build_review_instruction(commit_hash, output_format)},
+                config={"callbacks": callbacks}
+            )
+            
+            return self._parse_agent_result(result["output"], commit_hash, output_format)
+            
+        except Exception as e:
+            self.logger.error(f"Review failed: {e}")
+            return {"error": str(e)}
+    
+    def _build_review_instruction(self, commit_hash: str, output_format: str) -> str:
+        """エージェントへのレビュー指示を作成"""
+        return f"""
             コミット {commit_hash} の完全なC言語コードレビューを実行してください。
 
             手順:
@@ -173,40 +249,24 @@ class CCodeReviewAgent:
 
             出力形式: {output_format}
             """
-            
-            # エージェント実行
-            result = self.executor.run(review_instruction)
-            
-            # 結果の解析と整理
-            return self._parse_agent_result(result, commit_hash, output_format)
-            
-        except Exception as e:
-            self.logger.error(f"Review failed: {e}")
-            return {"error": str(e)}
     
-    def _parse_agent_result(self, result: str, commit_hash: str, output_format: str) -> Dict[str, str]:
+    def _parse_agent_result(self, result: Any, commit_hash: str, output_format: str) -> Dict[str, Any]:
         """エージェントの結果を解析して適切な形式で返す"""
-        try:
-            # 結果をJSONとして解析を試行
-            if isinstance(result, str):
-                # テキスト結果の場合は構造化する
-                return {
-                    "commit_hash": commit_hash,
-                    "status": "completed",
-                    "summary": result,
-                    "format": output_format
-                }
-            else:
-                return result
-                
-        except Exception as e:
-            self.logger.error(f"Failed to parse agent result: {e}")
-            return {
-                "commit_hash": commit_hash,
-                "status": "error", 
-                "error": str(e),
-                "raw_result": str(result)
-            }
+        # 構造化済みの結果はそのまま返す
+        if isinstance(result, dict):
+            return result
+        
+        # テキスト結果の場合は構造化する
+        if isinstance(result, str):
+            return {**_OK_TEMPLATE, "commit_hash": commit_hash, "summary": result, "format": output_format}
+        
+        self.logger.error(f"Failed to parse agent result: unexpected type {type(result).__name__}")
+        return {
+            "commit_hash": commit_hash,
+            "status": "error", 
+            "error": f"Unexpected agent result type: {type(result).__name__}",
+            "raw_result": str(result)
+        }
     
     def show_config(self) -> Dict[str, Any]:
         """現在の設定を表示"""
@@ -214,6 +274,9 @@ class CCodeReviewAgent:
     
     def get_memory_summary(self) -> str:
         """エージェントのメモリ（学習内容）の要約を取得"""
+        if self.memory is None:
+            return "Memory is disabled"
+        
         chat_history = self.memory.chat_memory.messages
         if not chat_history:
             return "No memory data available"
@@ -222,5 +285,8 @@ class CCodeReviewAgent:
     
     def clear_memory(self):
         """エージェントのメモリをクリア"""
+        if self.memory is None:
+            return
+        
         self.memory.clear()
         self.logger.info("Agent memory cleared")
\ No newline at end of file
@@ -3,18 +3,132 @@
 プロジェクト設定とレビュー観点の管理
 """
 
-import json
-import yaml
+import copy
+import fnmatch
+import os
+import re
 import logging
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from types import MappingProxyType
+from typing import Callable, Dict, IO, List, Any, Mapping, Optional, Pattern, Tuple
 from functools import lru_cache
 
+import orjson
+
+
+@lru_cache(maxsize=1)
+def _yaml_backend() -> Tuple[Any, Any, Any]:
+    """yamlモジュールとローダー/ダンパーを初回使用時にインポート"""
+    import yaml
+    
+    # LibYAMLが利用可能ならCベースのローダー/ダンパーを使用
+    try:
+        from yaml import CSafeLoader as loader, CSafeDumper as dumper
+    except ImportError:
+        from yaml import SafeLoader as loader, SafeDumper as dumper  # type: ignore[assignment]
+    
+    return yaml, loader, dumper
+
+
+def _load_yaml(stream: IO[str]) -> Any:
+    """YAMLを安全に読み込む"""
+    yaml, loader, _ = _yaml_backend()
+    return yaml.load(stream, Loader=loader)
+
+
+def _serialize_yaml(data: Any) -> bytes:
+    """設定をYAMLのバイト列に変換"""
+    yaml, _, dumper = _yaml_backend()
+    return yaml.dump(data, Dumper=dumper, default_flow_style=False, allow_unicode=True).encode('utf-8')
+
+
+def _load_json(stream: IO[str]) -> Any:
+    """JSONを読み込む"""
+    return orjson.loads(stream.read())
+
+
+def _serialize_json(data: Any) -> bytes:
+    """設定をJSONのバイト列に変換"""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+
+# 規約ファイルが未設定の場合に使用するデフォルトのレビュー観点（読み取り専用）
+_DEFAULT_REVIEW_STANDARDS: Mapping[str, List[Dict]] = MappingProxyType({
+    "security": [
+        {
+            "description": "バッファオーバーフローの防止",
+            "priority": "high",
+            "applicable_files": ["*.c", "*.h"],
+            "category": "security"
+        },
+        {
+            "description": "入力値検証の実装",
+            "priority": "high", 
+            "applicable_files": ["*.c"],
+            "category": "security"
+        },
+        {
+            "description": "危険な関数の回避",
+            "priority": "high",
+            "applicable_files": ["*.c"],
+            "category": "security"
+        }
+    ],
+    "memory_management": [
+        {
+            "description": "メモリリークの防止",
+            "priority": "high",
+            "applicable_files": ["*.c"],
+            "category": "memory_management"
+        },
+        {
+            "description": "NULLポインタアクセスの防止",
+            "priority": "high",
+            "applicable_files": ["*.c"],
+            "category": "memory_management"
+        },
+        {
+            "description": "適切なポインタ管理",
+            "priority": "medium",
+            "applicable_files": ["*.c", "*.h"],
+            "category": "memory_management"
+        }
+    ],
+    "performance": [
+        {
+            "description": "ループ効率の最適化",
+            "priority": "medium",
+            "applicable_files": ["*.c"],
+            "category": "performance"
+        },
+        {
+            "description": "関数呼び出しコストの考慮",
+            "priority": "medium",
+            "applicable_files": ["*.c"],
+            "category": "performance"
+        }
+    ],
+    "code_quality": [
+        {
+            "description": "適切なコメントの記述",
+            "priority": "low",
+            "applicable_files": ["*.c", "*.h"],
+            "category": "code_quality"
+        },
+        {
+            "description": "マジックナンバーの回避",
+            "priority": "medium",
+            "applicable_files": ["*.c"],
+            "category": "code_quality"
+        }
+    ]
+})
+
 
 class ConfigManager:
     """設定管理クラス"""
     
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: Optional[str] = None):
         self.config_path = Path(config_path) if config_path else Path(".code_review_agent")
         self.config_path.mkdir(exist_ok=True)
         
@@ -24,6 +138,17 @@ class ConfigManager:
         
         self.logger = logging.getLogger(__name__)
         
+        # 設定ファイルごとの (st_mtime_ns, 解析済みデータ) キャッシュ
+        self._cache: Dict[Path, Tuple[int, Any]] = {}
+        
+        # 設定内容が変わるたびに進むバージョン番号と、それに対応する派生設定
+        self._version = 0
+        self._agent_derived: Optional[Tuple[int, Dict[str, Dict[str, Any]]]] = None
+        
+        # get_rules_for_file 用のルール索引とファイルごとの結果
+        self._rules_index: Optional[Tuple[Tuple[Optional[int], int], List[Tuple[Pattern[str], Dict]]]] = None
+        self._rules_by_file: Dict[str, List[Dict]] = {}
+        
         # デフォルト設定を初期化
         self._initialize_default_configs()
     
@@ -66,7 +191,9 @@ class ConfigManager:
                     "model": "codellama",
                     "base_url": "http://localhost:11434",
                     "temperature": 0.1,
-                    "context_window": 4096
+                    "context_window": 4096,
+                    "keep_alive": "30m",
+                    "timeout": 120
                 },
                 "output": {
                     "format": "all",
@@ -82,11 +209,84 @@ class ConfigManager:
             }
             self.save_agent_config(default_agent_config)
     
+    def _load_cached(self, file_path: Path, parse: Callable[[IO[str]], Any]) -> Any:
+        """更新時刻が変わっていなければキャッシュ済みの解析結果を返す"""
+        try:
+            mtime = file_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            # 削除されたファイルのキャッシュを破棄
+            if self._cache.pop(file_path, None) is not None:
+                self._version += 1
+            raise
+        
+        cached = self._cache.get(file_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = parse(f)
+        self._cache[file_path] = (mtime, data)
+        self._version += 1
+        return data
+    
+    def _store_cache(self, file_path: Path, data: Any):
+        """保存した内容で再読み込みせずにキャッシュを更新"""
+        self._cache[file_path] = (file_path.stat().st_mtime_ns, copy.deepcopy(data))
+        self._version += 1
+    
+    def get_version(self) -> int:
+        """設定の読み込み・保存で内容が変わるたびに増えるバージョン番号を取得"""
+        return self._version
+    
+    def _load_config_file(self, file_path: Path, name: str) -> Dict[str, Any]:
+        """YAML設定を読み取り専用で取得（コピーしないため呼び出し側で変更しないこと）"""
+        try:
+            return self._load_cached(file_path, _load_yaml) or {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.error(f"Failed to load {name}: {e}")
+            return {}
+    
+    def _write_files(self, files: List[Tuple[Path, bytes, Any]]):
+        """シリアライズ済みの設定ファイルをまとめて書き込み、キャッシュを更新"""
+        for file_path, content, data in files:
+            self._atomic_write(file_path, content)
+            self._store_cache(file_path, data)
+        
+        # ディレクトリエントリの永続化は書き込み後に1回だけ行う
+        self._fsync_config_dir()
+    
+    def _atomic_write(self, file_path: Path, content: bytes):
+        """一時ファイルに書き込んでから置き換え、書き込み途中のファイルが残らないようにする"""
+        tmp_path = file_path.with_suffix(file_path.suffix + '.tmp')
+        try:
+            with open(tmp_path, 'wb', buffering=64 * 1024) as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    
+    def _fsync_config_dir(self):
+        """設定ディレクトリをfsync（対応していないプラットフォームでは何もしない）"""
+        try:
+            fd = os.open(self.config_path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    
     def save_project_config(self, config: Dict[str, Any]):
         """プロジェクト設定を保存"""
         try:
-            with open(self.project_config_file, 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
+            self._write_files([(self.project_config_file, _serialize_yaml(config), config)])
             self.logger.info("Project config saved successfully")
         except Exception as e:
             self.logger.error(f"Failed to save project config: {e}")
@@ -94,21 +294,12 @@ class ConfigManager:
     
     def load_project_config(self) -> Dict[str, Any]:
         """プロジェクト設定を読み込み"""
-        try:
-            if not self.project_config_file.exists():
-                return {}
-            
-            with open(self.project_config_file, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f) or {}
-        except Exception as e:
-            self.logger.error(f"Failed to load project config: {e}")
-            return {}
+        return copy.deepcopy(self._load_config_file(self.project_config_file, "project config"))
     
     def save_agent_config(self, config: Dict[str, Any]):
         """エージェント設定を保存"""
         try:
-            with open(self.agent_config_file, 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
+            self._write_files([(self.agent_config_file, _serialize_yaml(config), config)])
             self.logger.info("Agent config saved successfully")
         except Exception as e:
             self.logger.error(f"Failed to save agent config: {e}")
@@ -116,141 +307,83 @@ class ConfigManager:
     
     def load_agent_config(self) -> Dict[str, Any]:
         """エージェント設定を読み込み"""
-        try:
-            if not self.agent_config_file.exists():
-                return {}
-            
-            with open(self.agent_config_file, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f) or {}
-        except Exception as e:
-            self.logger.error(f"Failed to load agent config: {e}")
-            return {}
+        return copy.deepcopy(self._load_config_file(self.agent_config_file, "agent config"))
     
     def save_review_standards(self, standards: Dict[str, List[Dict]]):
         """レビュー観点を保存"""
         try:
-            with open(self.review_standards_file, 'w', encoding='utf-8') as f:
-                json.dump(standards, f, ensure_ascii=False, indent=2)
+            self._write_files([(self.review_standards_file, _serialize_json(standards), standards)])
             self.logger.info("Review standards saved successfully")
         except Exception as e:
             self.logger.error(f"Failed to save review standards: {e}")
             raise
     
-    def get_review_standards(self) -> Dict[str, List[Dict]]:
-        """レビュー観点を取得"""
+    def _load_review_standards(self) -> Mapping[str, List[Dict]]:
+        """レビュー観点を読み取り専用で取得（コピーしないため呼び出し側で変更しないこと）"""
         try:
-            if not self.review_standards_file.exists():
-                return self._get_default_review_standards()
-            
-            with open(self.review_standards_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self._load_cached(self.review_standards_file, _load_json)
+        except FileNotFoundError:
+            return _DEFAULT_REVIEW_STANDARDS
         except Exception as e:
             self.logger.error(f"Failed to load review standards: {e}")
-            return self._get_default_review_standards()
+            return _DEFAULT_REVIEW_STANDARDS
+    
+    def get_review_standards(self) -> Dict[str, List[Dict]]:
+        """レビュー観点を取得"""
+        return copy.deepcopy(dict(self._load_review_standards()))
     
     def _get_default_review_standards(self) -> Dict[str, List[Dict]]:
         """デフォルトのレビュー観点を取得"""
-        return {
-            "security": [
-                {
-                    "description": "バッファオーバーフローの防止",
-                    "priority": "high",
-                    "applicable_files": ["*.c", "*.h"],
-                    "category": "security"
-                },
-                {
-                    "description": "入力値検証の実装",
-                    "priority": "high", 
-                    "applicable_files": ["*.c"],
-                    "category": "security"
-                },
-                {
-                    "description": "危険な関数の回避",
-                    "priority": "high",
-                    "applicable_files": ["*.c"],
-                    "category": "security"
-                }
-            ],
-            "memory_management": [
-                {
-                    "description": "メモリリークの防止",
-                    "priority": "high",
-                    "applicable_files": ["*.c"],
-                    "category": "memory_management"
-                },
-                {
-                    "description": "NULLポインタアクセスの防止",
-                    "priority": "high",
-                    "applicable_files": ["*.c"],
-                    "category": "memory_management"
-                },
-                {
-                    "description": "適切なポインタ管理",
-                    "priority": "medium",
-                    "applicable_files": ["*.c", "*.h"],
-                    "category": "memory_management"
-                }
-            ],
-            "performance": [
-                {
-                    "description": "ループ効率の最適化",
-                    "priority": "medium",
-                    "applicable_files": ["*.c"],
-                    "category": "performance"
-                },
-                {
-                    "description": "関数呼び出しコストの考慮",
-                    "priority": "medium",
-                    "applicable_files": ["*.c"],
-                    "category": "performance"
-                }
-            ],
-            "code_quality": [
-                {
-                    "description": "適切なコメントの記述",
-                    "priority": "low",
-                    "applicable_files": ["*.c", "*.h"],
-                    "category": "code_quality"
-                },
-                {
-                    "description": "マジックナンバーの回避",
-                    "priority": "medium",
-                    "applicable_files": ["*.c"],
-                    "category": "code_quality"
-                }
-            ]
-        }
+        return copy.deepcopy(dict(_DEFAULT_REVIEW_STANDARDS))
     
-    @lru_cache(maxsize=128)
-    def get_rules_for_file(self, file_path: str) -> List[Dict]:
-        """ファイルに適用すべきルールをキャッシュ付きで取得"""
-        import fnmatch
+    def _get_rules_index(self) -> List[Tuple[Pattern[str], Dict]]:
+        """applicable_filesをルールごとに1つの正規表現へまとめた索引を取得"""
+        try:
+            mtime: Optional[int] = self.review_standards_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
         
-        standards = self.get_review_standards()
-        applicable_rules = []
+        # レビュー観点のファイルが更新されたか、設定のバージョンが進んだ場合のみ索引を再構築
+        if self._rules_index is None or self._rules_index[0] != (mtime, self._version):
+            index = []
+            for rules in self._load_review_standards().values():
+                for rule in rules:
+                    patterns = rule.get("applicable_files", ["*"])
+                    regex = "|".join(fnmatch.translate(pattern) for pattern in patterns)
+                    index.append((re.compile(regex), rule))
+            # 読み込みで進んだバージョンで記録し、次回の呼び出しで無駄に再構築しないようにする
+            self._rules_index = ((mtime, self._version), index)
+            self._rules_by_file.clear()
+        
+        return self._rules_index[1]
+    
+    def get_rules_for_file(self, file_path: str) -> List[Dict]:
+        """ファイルに適用すべきルールをキャッシュ付きで取得（キャッシュと共有しないコピーを返す）"""
+        index = self._get_rules_index()
         
-        for category, rules in standards.items():
-            for rule in rules:
-                applicable_files = rule.get("applicable_files", ["*"])
-                
-                # ファイルパターンマッチング
-                for pattern in applicable_files:
-                    if fnmatch.fnmatch(file_path, pattern):
-                        applicable_rules.append(rule)
-                        break
+        applicable_rules = self._rules_by_file.get(file_path)
+        if applicable_rules is None:
+            applicable_rules = [rule for pattern, rule in index if pattern.match(file_path)]
+            self._rules_by_file[file_path] = applicable_rules
         
-        return applicable_rules
+        # キャッシュしたルールは読み込み済みの設定（既定値を含む）そのものなので、呼び出し元にはコピーを渡す
+        return copy.deepcopy(applicable_rules)
     
     def get_current_config(self) -> Dict[str, Any]:
-        """現在の全設定を取得"""
-        return {
-            "project": self.load_project_config(),
-            "agent": self.load_agent_config(),
-            "review_standards": self.get_review_standards(),
+        """現在の全設定を取得（呼び出しごとに独立したコピーを返すため、変更しても他の呼び出し元には影響しない）"""
+        project = self._load_config_file(self.project_config_file, "project config")
+        agent = self._load_config_file(self.agent_config_file, "agent config")
+        standards = self._load_review_standards()
+        
+        # キャッシュ済みの解析結果を参照で組み立て、呼び出し元にはまとめて1回だけディープコピーして渡す
+        return copy.deepcopy({
+            "project": project,
+            "agent": agent,
+            "review_standards": dict(standards),
             "config_path": str(self.config_path)
-        }
+        })
     
-    def update_project_info(self, project_name: str = None, project_type: str = None, **kwargs):
+    def update_project_info(self, project_name: Optional[str] = None, project_type: Optional[str] = None, **kwargs):
         """プロジェクト情報を更新"""
         config = self.load_project_config()
         
@@ -303,40 +436,49 @@ class ConfigManager:
         self.save_agent_config(config)
         self.logger.info(f"Updated agent setting: {setting_path} = {value}")
     
+    def _get_agent_derived(self) -> Dict[str, Dict[str, Any]]:
+        """エージェント設定から各セクションを取り出す（設定が変わった場合のみ再計算）"""
+        agent_config = self._load_config_file(self.agent_config_file, "agent config")
+        
+        if self._agent_derived is None or self._agent_derived[0] != self._version:
+            self._agent_derived = (self._version, {
+                "llm": agent_config.get("llm_config", {
+                    "model": "codellama",
+                    "base_url": "http://localhost:11434",
+                    "temperature": 0.1
+                }),
+                "output": agent_config.get("output", {
+                    "format": "all",
+                    "include_suggestions": True,
+                    "include_code_examples": True
+                }),
+                "tools": agent_config.get("tools", {})
+            })
+        
+        return self._agent_derived[1]
+    
     def get_llm_config(self) -> Dict[str, Any]:
         """LLM設定を取得"""
-        agent_config = self.load_agent_config()
-        return agent_config.get("llm_config", {
-            "model": "codellama",
-            "base_url": "http://localhost:11434",
-            "temperature": 0.1
-        })
+        return dict(self._get_agent_derived()["llm"])
     
     def get_output_config(self) -> Dict[str, Any]:
         """出力設定を取得"""
-        agent_config = self.load_agent_config()
-        return agent_config.get("output", {
-            "format": "all",
-            "include_suggestions": True,
-            "include_code_examples": True
-        })
+        return dict(self._get_agent_derived()["output"])
     
     def is_tool_enabled(self, tool_name: str) -> bool:
         """ツールが有効かチェック"""
-        agent_config = self.load_agent_config()
-        tools_config = agent_config.get("tools", {})
-        return tools_config.get(f"enable_{tool_name}", True)
+        return self._get_agent_derived()["tools"].get(f"enable_{tool_name}", True)
     
     def export_config(self, export_path: str):
         """設定をエクスポート"""
         export_data = self.get_current_config()
         
         export_file = Path(export_path)
-        with open(export_file, 'w', encoding='utf-8') as f:
+        with open(export_file, 'wb') as f:
             if export_file.suffix.lower() == '.json':
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
+                f.write(_serialize_json(export_data))
             else:
-                yaml.dump(export_data, f, default_flow_style=False, allow_unicode=True)
+                f.write(_serialize_yaml(export_data))
         
         self.logger.info(f"Configuration exported to: {export_path}")
     
@@ -349,18 +491,27 @@ class ConfigManager:
         
         with open(import_file, 'r', encoding='utf-8') as f:
             if import_file.suffix.lower() == '.json':
-                import_data = json.load(f)
+                import_data = _load_json(f)
             else:
-                import_data = yaml.safe_load(f)
+                import_data = _load_yaml(f)
         
-        # 各設定を更新
+        # 各設定をシリアライズしてからまとめて書き込む
+        files = []
         if "project" in import_data:
-            self.save_project_config(import_data["project"])
+            files.append((self.project_config_file, _serialize_yaml(import_data["project"]), import_data["project"]))
         
         if "agent" in import_data:
-            self.save_agent_config(import_data["agent"])
+            files.append((self.agent_config_file, _serialize_yaml(import_data["agent"]), import_data["agent"]))
         
         if "review_standards" in import_data:
-            self.save_review_standards(import_data["review_standards"])
+            standards = import_data["review_standards"]
+            files.append((self.review_standards_file, _serialize_json(standards), standards))
         
-        self.logger.info(f"Configuration imported from: {import_path}")
\ No newline at end of file
+        self._write_files(files)
+        self.logger.info(f"Configuration imported from: {import_path}")
+
+
+@lru_cache(maxsize=4)
+def get_config_manager(config_path: Optional[str] = None) -> ConfigManager:
+    """設定パスごとに共有されるConfigManagerを取得"""
+    return ConfigManager(config_path)
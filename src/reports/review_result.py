@@ -3,26 +3,65 @@
 C言語レビュー結果の完全な構造
 """
 
+import sys
+from collections import Counter
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Set
+import orjson
+from pydantic import BaseModel, Field, PrivateAttr
 
 
-class CReviewIssue(BaseModel):
-    """C言語レビュー問題の詳細構造"""
-    file_path: str = Field(description="指摘ファイルのパス")
-    line_number: Optional[int] = Field(description="指摘箇所の行番号")
-    column_number: Optional[int] = Field(description="指摘箇所の列番号")
-    function_name: Optional[str] = Field(description="指摘箇所の関数名")
-    rule_description: Optional[str] = Field(description="適用されたレビュー観点")
-    category: str = Field(description="問題カテゴリ（security/performance/quality等）")
-    severity: str = Field(description="重要度（critical/high/medium/low）")
-    message: str = Field(description="問題の詳細説明")
-    suggestion: Optional[str] = Field(description="具体的な改善提案")
-    code_snippet: Optional[str] = Field(description="問題のあるコード抜粋")
-    fixed_code_example: Optional[str] = Field(description="修正例のコード")
-    tool_source: Optional[str] = Field(description="問題を検出したツール名")
-    confidence: Optional[float] = Field(description="検出の信頼度（0.0-1.0）")
+# to_simple_dict で出力するフィールド（列番号・検出ツール・信頼度などは含めない）
+_SIMPLE_ISSUE_FIELDS = {
+    "file_path", "line_number", "function_name", "category", "severity",
+    "message", "suggestion", "code_snippet", "fixed_code_example"
+}
+_SIMPLE_DICT_INCLUDE = {
+    "commit_hash": True,
+    "timestamp": True,
+    "reviewed_files": True,
+    "total_lines_reviewed": True,
+    "issues": {"__all__": _SIMPLE_ISSUE_FIELDS},
+    "summary": True,
+    "metrics": True,
+    "critical_recommendations": True,
+    "general_recommendations": True,
+    "applied_review_points": True,
+    "errors": True,
+    "warnings": True
+}
+
+
+@dataclass
+class CReviewIssue:
+    """C言語レビュー問題の詳細構造（大量に生成されるため__slots__付きのdataclassで保持）"""
+    __slots__ = (
+        "file_path", "line_number", "column_number", "function_name", "rule_description",
+        "category", "severity", "message", "suggestion", "code_snippet",
+        "fixed_code_example", "tool_source", "confidence"
+    )
+    
+    file_path: str                       # 指摘ファイルのパス
+    line_number: Optional[int]           # 指摘箇所の行番号
+    column_number: Optional[int]         # 指摘箇所の列番号
+    function_name: Optional[str]         # 指摘箇所の関数名
+    rule_description: Optional[str]      # 適用されたレビュー観点
+    category: str                        # 問題カテゴリ（security/performance/quality等）
+    severity: str                        # 重要度（critical/high/medium/low）
+    message: str                         # 問題の詳細説明
+    suggestion: Optional[str]            # 具体的な改善提案
+    code_snippet: Optional[str]          # 問題のあるコード抜粋
+    fixed_code_example: Optional[str]    # 修正例のコード
+    tool_source: Optional[str]           # 問題を検出したツール名
+    confidence: Optional[float]          # 検出の信頼度（0.0-1.0）
+    
+    def __post_init__(self):
+        # 取りうる値の少ない文字列をインターンして同じオブジェクトを共有する
+        self.severity = sys.intern(self.severity)
+        self.category = sys.intern(self.category)
+        if self.tool_source is not None:
+            self.tool_source = sys.intern(self.tool_source)
 
 
 class CFileAnalysis(BaseModel):
@@ -96,38 +135,55 @@ class CReviewResult(BaseModel):
     errors: List[str] = []
     warnings: List[str] = []
     
+    # 重複チェック用の集合（シリアライズ対象外）
+    _reviewed_files_set: Set[str] = PrivateAttr(default_factory=set)
+    _applied_review_points_set: Set[str] = PrivateAttr(default_factory=set)
+    
+    # add_issue で更新する集計値と、finalize 後に変更があったかのフラグ
+    _severity_counts: Counter = PrivateAttr(default_factory=Counter)
+    _category_counts: Counter = PrivateAttr(default_factory=Counter)
+    _issue_files: Set[str] = PrivateAttr(default_factory=set)
+    _counted_issues: int = PrivateAttr(default=0)
+    _dirty: bool = PrivateAttr(default=True)
+    
+    def model_post_init(self, __context: Any) -> None:
+        self._reviewed_files_set.update(self.reviewed_files)
+        self._applied_review_points_set.update(self.applied_review_points)
+        self._count_issues(self.issues)
+    
+    def _count_issues(self, issues: List[CReviewIssue]):
+        """問題を集計値に加算"""
+        for issue in issues:
+            self._severity_counts[issue.severity] += 1
+            self._category_counts[issue.category] += 1
+            self._issue_files.add(issue.file_path)
+        self._counted_issues += len(issues)
+    
     def calculate_summary(self):
         """サマリー情報を計算"""
+        # issues が直接書き換えられている場合もあるため、常に1回の走査で集計し直す
+        self._severity_counts.clear()
+        self._category_counts.clear()
+        self._issue_files.clear()
+        self._counted_issues = 0
+        self._count_issues(self.issues)
+        
         self.summary.total_files = len(self.reviewed_files)
         self.summary.total_lines = self.total_lines_reviewed
         self.summary.total_issues = len(self.issues)
-        
-        # 重要度別集計
-        severity_counts = {}
-        category_counts = {}
-        
-        for issue in self.issues:
-            # 重要度別
-            severity = issue.severity
-            severity_counts[severity] = severity_counts.get(severity, 0) + 1
-            
-            # カテゴリ別
-            category = issue.category
-            category_counts[category] = category_counts.get(category, 0) + 1
-        
-        self.summary.issues_by_severity = severity_counts
-        self.summary.issues_by_category = category_counts
-        
-        # 問題のあるファイル数を計算
-        files_with_issues = set()
-        for issue in self.issues:
-            files_with_issues.add(issue.file_path)
-        
-        self.summary.files_with_issues = len(files_with_issues)
+        self.summary.issues_by_severity = dict(self._severity_counts)
+        self.summary.issues_by_category = dict(self._category_counts)
+        self.summary.files_with_issues = len(self._issue_files)
         self.summary.clean_files = self.summary.total_files - self.summary.files_with_issues
     
     def calculate_metrics(self):
         """メトリクスを計算"""
+        # 最新の問題一覧から集計し直したサマリーを元に計算
+        self.calculate_summary()
+        self._calculate_metrics_from_summary()
+    
+    def _calculate_metrics_from_summary(self):
+        """集計済みのサマリーからメトリクスを計算"""
         if not self.issues:
             self.metrics.overall_quality_score = 100.0
             self.metrics.security_score = 100.0
@@ -141,10 +197,13 @@ class CReviewResult(BaseModel):
             'low': 1
         }
         
-        total_weight = 0
-        for issue in self.issues:
-            weight = severity_weights.get(issue.severity, 1)
-            total_weight += weight
+        issues_by_severity = self.summary.issues_by_severity
+        issues_by_category = self.summary.issues_by_category
+        
+        total_weight = sum(
+            severity_weights.get(severity, 1) * count
+            for severity, count in issues_by_severity.items()
+        )
         
         # 基本スコア計算（問題数に基づく）
         base_score = max(0, 100 - (total_weight * 2))  # 重み付き問題数から減点
@@ -152,8 +211,8 @@ class CReviewResult(BaseModel):
         self.metrics.overall_quality_score = base_score
         
         # カテゴリ別スコア計算
-        security_issues = len([i for i in self.issues if i.category == 'security'])
-        performance_issues = len([i for i in self.issues if i.category == 'performance'])
+        security_issues = issues_by_category.get('security', 0)
+        performance_issues = issues_by_category.get('performance', 0)
         
         self.metrics.security_score = max(0, 100 - (security_issues * 15))
         self.metrics.performance_score = max(0, 100 - (performance_issues * 10))
@@ -172,13 +231,17 @@ class CReviewResult(BaseModel):
     def add_issue(self, issue: CReviewIssue):
         """問題を追加"""
         self.issues.append(issue)
+        self._count_issues([issue])
+        self._dirty = True
     
     def add_file_analysis(self, analysis: CFileAnalysis):
         """ファイル解析結果を追加"""
         self.file_analyses.append(analysis)
-        if analysis.file_path not in self.reviewed_files:
+        if analysis.file_path not in self._reviewed_files_set:
+            self._reviewed_files_set.add(analysis.file_path)
             self.reviewed_files.append(analysis.file_path)
         self.total_lines_reviewed += analysis.line_count
+        self._dirty = True
     
     def add_recommendation(self, recommendation: str, is_critical: bool = False):
         """推奨事項を追加"""
@@ -189,7 +252,8 @@ class CReviewResult(BaseModel):
     
     def add_applied_review_point(self, point: str):
         """適用されたレビュー観点を追加"""
-        if point not in self.applied_review_points:
+        if point not in self._applied_review_points_set:
+            self._applied_review_points_set.add(point)
             self.applied_review_points.append(point)
     
     def add_error(self, error: str):
@@ -202,35 +266,19 @@ class CReviewResult(BaseModel):
     
     def finalize(self):
         """レビュー結果を最終化（サマリーとメトリクスを計算）"""
+        # 前回の最終化以降に問題・ファイルが追加されていなければ再計算しない
+        if not self._dirty and self._counted_issues == len(self.issues):
+            return
+        
+        # 集計は1回だけ行い、メトリクスはその結果から計算
         self.calculate_summary()
-        self.calculate_metrics()
+        self._calculate_metrics_from_summary()
+        self._dirty = False
     
     def to_simple_dict(self) -> Dict[str, Any]:
         """シンプルな辞書形式に変換（JSON出力用）"""
-        return {
-            "commit_hash": self.commit_hash,
-            "timestamp": self.timestamp,
-            "reviewed_files": self.reviewed_files,
-            "total_lines_reviewed": self.total_lines_reviewed,
-            "issues": [
-                {
-                    "file_path": issue.file_path,
-                    "line_number": issue.line_number,
-                    "function_name": issue.function_name,
-                    "category": issue.category,
-                    "severity": issue.severity,
-                    "message": issue.message,
-                    "suggestion": issue.suggestion,
-                    "code_snippet": issue.code_snippet,
-                    "fixed_code_example": issue.fixed_code_example
-                }
-                for issue in self.issues
-            ],
-            "summary": self.summary.dict(),
-            "metrics": self.metrics.dict(),
-            "critical_recommendations": self.critical_recommendations,
-            "general_recommendations": self.general_recommendations,
-            "applied_review_points": self.applied_review_points,
-            "errors": self.errors,
-            "warnings": self.warnings
-        }
\ No newline at end of file
+        return self.model_dump(mode='json', include=_SIMPLE_DICT_INCLUDE)
+    
+    def to_simple_json(self) -> bytes:
+        """シンプルな形式のJSONバイト列に変換"""
+        return orjson.dumps(self.to_simple_dict(), option=orjson.OPT_NON_STR_KEYS)
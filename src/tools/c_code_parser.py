@@ -3,15 +3,60 @@ C言語コード解析ツール
 関数、構造体、マクロ等の抽出と複雑度計算
 """
 
+import os
 import re
 import json
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Match, Optional, Tuple
 from pathlib import Path
 
+import orjson
+
 from langchain.tools import BaseTool
 
 
+# 解析結果をキャッシュするファイル数の上限
+ANALYSIS_CACHE_SIZE = 128
+
+# 関数定義のパターン（戻り値型 関数名(引数) { の形式）
+_FUNC_RE = re.compile(r'((?:static\s+|inline\s+|extern\s+)*\w+(?:\s*\*\s*)*)\s+(\w+)\s*\([^)]*\)\s*{', re.MULTILINE)
+# typedef struct / 通常の struct パターン
+_TYPEDEF_STRUCT_RE = re.compile(r'typedef\s+struct\s*(\w+)?\s*{([^}]*)}\s*(\w+);?', re.DOTALL)
+_STRUCT_RE = re.compile(r'struct\s+(\w+)\s*{([^}]*)};', re.DOTALL)
+# #define パターン
+_MACRO_RE = re.compile(r'#define\s+(\w+)(?:\([^)]*\))?\s+(.*)$', re.MULTILINE)
+_INCLUDE_RE = re.compile(r'#include\s*[<"](.*?)[>"]')
+# 関数外での変数宣言（簡易的）の検出で追跡する字句（宣言は行頭のみ、空白は行をまたがない）
+_GLOBAL_SCAN_RE = re.compile(
+    r'(?P<declaration>^[^\S\n]*(?P<type>(?:static[^\S\n]+|extern[^\S\n]+|const[^\S\n]+)*\w+(?:[^\S\n]*\*[^\S\n]*)*)'
+    r'[^\S\n]+(?P<name>\w+)(?:[^\S\n]*=[^\S\n]*[^;\n]+)?;)'
+    r'|(?P<open_brace>\{)|(?P<close_brace>\})|(?P<newline>\n)',
+    re.MULTILINE
+)
+# 構造体メンバー（本体の先頭またはセミコロンの直後から次のセミコロンまで）
+_STRUCT_MEMBER_RE = re.compile(r'(?:^|(?<=;))\s*(\w+(?:\s*\*\s*)*)\s+(\w+)([^;]*)')
+_PARAM_RE = re.compile(r'\(([^)]*)\)')
+# _detect_c_issues で使う字句（危険な関数の呼び出しと、メモリ操作・if文の出現）
+_C_ISSUE_TOKEN_RE = re.compile(r'\b(?:(strcpy|strcat|sprintf|gets|scanf)\s*\(|(malloc|calloc|free|if)\b)')
+_NEWLINE_RE = re.compile(r'\n')
+_BRACE_RE = re.compile(r'[{}]')
+# 複雑度計算で数える字句（分岐キーワードは単語境界で一致させ、ifdef等の部分一致を除外）
+_COMPLEXITY_TOKEN_RE = re.compile(r'\b(?:if|while|for|switch|case)\b|&&|\|\||[{}\n]')
+
+
+def _newline_offsets(content: str) -> List[int]:
+    """改行文字の位置を昇順に列挙（行番号の二分探索用）"""
+    return [match.start() for match in _NEWLINE_RE.finditer(content)]
+
+
+def _line_number(newlines: List[int], pos: int) -> int:
+    """文字位置を1始まりの行番号に変換"""
+    return bisect_left(newlines, pos) + 1
+
+
 class CCodeParserTool(BaseTool):
     """C言語ファイルを解析して構造を抽出するツール"""
     
@@ -21,45 +66,114 @@ class CCodeParserTool(BaseTool):
     def __init__(self):
         super().__init__()
         self.logger = logging.getLogger(__name__)
+        # (パス, 更新時刻, サイズ) をキーにした解析結果のキャッシュ
+        self.analysis_cache: Dict[Tuple[str, int, int], str] = {}
     
-    def _run(self, file_path: str) -> str:
-        """C言語ファイルを解析"""
+    def _run(self, file_path: str = None, file_paths: List[str] = None) -> str:
+        """C言語ファイルを解析（file_pathsを指定すると複数ファイルをまとめて解析）"""
+        if file_paths:
+            return self._run_batch(file_paths)
+        if not file_path:
+            return json.dumps({"error": "file_path or file_paths required"})
+        
+        return self._parse_file(file_path)
+    
+    def _run_batch(self, file_paths: List[str]) -> str:
+        """複数ファイルをプロセスプールで並列に解析"""
+        try:
+            analyses = {}
+            pending = []
+            
+            for path in dict.fromkeys(file_paths):
+                cache_key = self._cache_key(path)
+                cached = self.analysis_cache.get(cache_key) if cache_key else None
+                if cached is not None:
+                    analyses[path] = orjson.loads(cached)
+                else:
+                    pending.append((path, cache_key))
+            
+            if len(pending) > 1:
+                # 正規表現による解析はCPUバウンドのため、GILを避けてプロセスに分散する
+                paths = [path for path, _ in pending]
+                with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(pending))) as executor:
+                    for (path, cache_key), result in zip(pending, executor.map(_parse_one, paths)):
+                        analysis = orjson.loads(result)
+                        if cache_key and "error" not in analysis:
+                            self._store_result(cache_key, result)
+                        analyses[path] = analysis
+            elif pending:
+                path = pending[0][0]
+                analyses[path] = orjson.loads(self._parse_file(path))
+            
+            files = [analyses[path] for path in file_paths]
+            return orjson.dumps({"files": files}, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+            
+        except Exception as e:
+            self.logger.error(f"Failed to parse C code batch: {e}")
+            return json.dumps({"error": str(e)})
+    
+    def _cache_key(self, file_path: str) -> Optional[Tuple[str, int, int]]:
+        """解析結果キャッシュのキー（パス, 更新時刻, サイズ）を取得"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (file_path, stat.st_mtime_ns, stat.st_size)
+    
+    def _store_result(self, cache_key: Tuple[str, int, int], result: str):
+        """解析結果をキャッシュに保存"""
+        if len(self.analysis_cache) >= ANALYSIS_CACHE_SIZE:
+            # 最も古いエントリを破棄
+            del self.analysis_cache[next(iter(self.analysis_cache))]
+        self.analysis_cache[cache_key] = result
+    
+    def _parse_file(self, file_path: str) -> str:
+        """1つのC言語ファイルを解析"""
         try:
             if not Path(file_path).exists():
                 return json.dumps({"error": f"File not found: {file_path}"})
             
+            # 内容が変わっていないファイルは前回の解析結果を返す
+            cache_key = self._cache_key(file_path)
+            cached = self.analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
+            # 行番号の計算用に改行位置を一度だけ求める
+            newlines = _newline_offsets(content)
+            
+            functions = self._extract_functions(content, newlines)
+            
             analysis = {
                 "file_path": file_path,
-                "functions": self._extract_functions(content),
-                "structs": self._extract_structs(content),
-                "macros": self._extract_macros(content),
-                "includes": self._extract_includes(content),
+                "functions": functions,
+                "structs": self._extract_structs(content, newlines),
+                "macros": self._extract_macros(content, newlines),
+                "includes": self._extract_includes(content, newlines),
                 "global_variables": self._extract_global_vars(content),
-                "complexity_metrics": self._calculate_file_complexity(content),
+                "complexity_metrics": self._calculate_file_complexity(functions),
                 "potential_issues": self._detect_c_issues(content),
-                "line_count": len(content.split('\n')),
+                "line_count": len(newlines) + 1,
                 "function_count": content.count('(')  # 簡易カウント
             }
             
-            return json.dumps(analysis, ensure_ascii=False, indent=2)
+            result = orjson.dumps(analysis, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+            
+            self._store_result(cache_key, result)
+            return result
             
         except Exception as e:
             self.logger.error(f"Failed to parse C code {file_path}: {e}")
             return json.dumps({"error": str(e)})
     
-    def _extract_functions(self, content: str) -> List[Dict]:
+    def _extract_functions(self, content: str, newlines: List[int]) -> List[Dict]:
         """関数定義を抽出"""
         functions = []
         
-        # 関数定義のパターン（戻り値型 関数名(引数) { の形式）
-        func_pattern = r'((?:static\s+|inline\s+|extern\s+)*\w+(?:\s*\*\s*)*)\s+(\w+)\s*\([^)]*\)\s*{'
-        
-        matches = re.finditer(func_pattern, content, re.MULTILINE)
-        
-        for match in matches:
+        for match in _FUNC_RE.finditer(content):
             func_start = match.start()
             return_type = match.group(1).strip()
             func_name = match.group(2)
@@ -69,30 +183,29 @@ class CCodeParserTool(BaseTool):
             func_body = content[func_start:func_end]
             
             # 関数の詳細解析
+            complexity = self._calculate_function_complexity(func_body)
             functions.append({
                 "name": func_name,
                 "return_type": return_type,
-                "start_line": content[:func_start].count('\n') + 1,
-                "end_line": content[:func_end].count('\n') + 1,
+                "start_line": _line_number(newlines, func_start),
+                "end_line": _line_number(newlines, func_end),
                 "line_count": func_body.count('\n'),
                 "parameters": self._extract_parameters(match.group(0)),
-                "complexity": self._calculate_function_complexity(func_body),
+                "complexity": complexity,
                 "has_return": "return" in func_body,
                 "malloc_count": func_body.count('malloc'),
                 "free_count": func_body.count('free'),
-                "potential_issues": self._analyze_function_issues(func_body)
+                "potential_issues": self._analyze_function_issues(func_body, complexity)
             })
         
         return functions
     
-    def _extract_structs(self, content: str) -> List[Dict]:
+    def _extract_structs(self, content: str, newlines: List[int]) -> List[Dict]:
         """構造体定義を抽出"""
         structs = []
         
         # typedef struct パターン
-        typedef_pattern = r'typedef\s+struct\s*(\w+)?\s*{([^}]*)}\s*(\w+);?'
-        
-        for match in re.finditer(typedef_pattern, content, re.DOTALL):
+        for match in _TYPEDEF_STRUCT_RE.finditer(content):
             struct_tag = match.group(1)
             struct_body = match.group(2)
             typedef_name = match.group(3)
@@ -101,14 +214,12 @@ class CCodeParserTool(BaseTool):
                 "name": typedef_name,
                 "tag": struct_tag,
                 "members": self._parse_struct_members(struct_body),
-                "line_number": content[:match.start()].count('\n') + 1,
-                "size_estimate": len(struct_body.split(';')) - 1  # セミコロンの数から推定
+                "line_number": _line_number(newlines, match.start()),
+                "size_estimate": struct_body.count(';')  # セミコロンの数から推定
             })
         
         # 通常の struct パターン
-        struct_pattern = r'struct\s+(\w+)\s*{([^}]*)};'
-        
-        for match in re.finditer(struct_pattern, content, re.DOTALL):
+        for match in _STRUCT_RE.finditer(content):
             struct_name = match.group(1)
             struct_body = match.group(2)
             
@@ -116,45 +227,40 @@ class CCodeParserTool(BaseTool):
                 "name": struct_name,
                 "tag": struct_name,
                 "members": self._parse_struct_members(struct_body),
-                "line_number": content[:match.start()].count('\n') + 1,
-                "size_estimate": len(struct_body.split(';')) - 1
+                "line_number": _line_number(newlines, match.start()),
+                "size_estimate": struct_body.count(';')
             })
         
         return structs
     
-    def _extract_macros(self, content: str) -> List[Dict]:
+    def _extract_macros(self, content: str, newlines: List[int]) -> List[Dict]:
         """マクロ定義を抽出"""
         macros = []
         
-        # #define パターン
-        macro_pattern = r'#define\s+(\w+)(?:\([^)]*\))?\s+(.*)$'
-        
-        for match in re.finditer(macro_pattern, content, re.MULTILINE):
+        for match in _MACRO_RE.finditer(content):
             macro_name = match.group(1)
             macro_value = match.group(2).strip()
             
             macros.append({
                 "name": macro_name,
                 "value": macro_value,
-                "line_number": content[:match.start()].count('\n') + 1,
+                "line_number": _line_number(newlines, match.start()),
                 "is_function_like": '(' in match.group(0),
                 "complexity": "high" if len(macro_value) > 50 else "low"
             })
         
         return macros
     
-    def _extract_includes(self, content: str) -> List[Dict]:
+    def _extract_includes(self, content: str, newlines: List[int]) -> List[Dict]:
         """インクルード文を抽出"""
         includes = []
         
-        include_pattern = r'#include\s*[<"](.*?)[>"]'
-        
-        for match in re.finditer(include_pattern, content):
+        for match in _INCLUDE_RE.finditer(content):
             header_file = match.group(1)
             
             includes.append({
                 "file": header_file,
-                "line_number": content[:match.start()].count('\n') + 1,
+                "line_number": _line_number(newlines, match.start()),
                 "is_system": match.group(0).count('<') > 0,
                 "is_local": match.group(0).count('"') > 0
             })
@@ -165,59 +271,65 @@ class CCodeParserTool(BaseTool):
         """グローバル変数を抽出（簡易版）"""
         global_vars = []
         
-        # 関数外での変数宣言を検出（簡易的）
-        var_pattern = r'^((?:static\s+|extern\s+|const\s+)*\w+(?:\s*\*\s*)*)\s+(\w+)(?:\s*=\s*[^;]+)?;'
-        
-        lines = content.split('\n')
-        in_function = False
         brace_count = 0
+        line_number = 1
+        declaration = None  # 現在の行の先頭にある変数宣言
+        
+        # 波括弧・改行・行頭の宣言を1回の走査で辿り、行末で関数外かどうかを判定
+        for match in _GLOBAL_SCAN_RE.finditer(content):
+            kind = match.lastgroup
+            if kind == 'newline':
+                if declaration and brace_count == 0:
+                    global_vars.append(self._global_var_info(declaration, line_number))
+                declaration = None
+                line_number += 1
+            elif kind == 'open_brace':
+                brace_count += 1
+            elif kind == 'close_brace':
+                brace_count -= 1
+            else:
+                # 初期化子に含まれる波括弧も数える
+                text = match.group()
+                brace_count += text.count('{') - text.count('}')
+                declaration = match
         
-        for i, line in enumerate(lines):
-            line = line.strip()
-            
-            # 関数内かどうかの判定
-            brace_count += line.count('{') - line.count('}')
-            
-            if brace_count == 0 and not in_function:
-                match = re.match(var_pattern, line)
-                if match and not line.startswith('#'):
-                    var_type = match.group(1).strip()
-                    var_name = match.group(2)
-                    
-                    global_vars.append({
-                        "name": var_name,
-                        "type": var_type,
-                        "line_number": i + 1,
-                        "is_static": "static" in var_type,
-                        "is_const": "const" in var_type,
-                        "is_pointer": "*" in var_type
-                    })
+        if declaration and brace_count == 0:
+            global_vars.append(self._global_var_info(declaration, line_number))
         
         return global_vars
     
+    def _global_var_info(self, match: Match, line_number: int) -> Dict:
+        """変数宣言のマッチからグローバル変数の情報を作成"""
+        var_type = match.group('type').strip()
+        
+        return {
+            "name": match.group('name'),
+            "type": var_type,
+            "line_number": line_number,
+            "is_static": "static" in var_type,
+            "is_const": "const" in var_type,
+            "is_pointer": "*" in var_type
+        }
+    
     def _find_function_end(self, content: str, start_pos: int) -> int:
         """関数の終了位置を見つける"""
         brace_count = 0
-        pos = start_pos
-        found_start = False
         
-        while pos < len(content):
-            char = content[pos]
-            if char == '{':
+        # 波括弧の位置だけを正規表現で辿る
+        for match in _BRACE_RE.finditer(content, start_pos):
+            if match.group() == '{':
                 brace_count += 1
-                found_start = True
-            elif char == '}':
+            else:
                 brace_count -= 1
-                if found_start and brace_count == 0:
-                    return pos + 1
-            pos += 1
+                if brace_count == 0:
+                    return match.end()
         
         return len(content)
     
     def _extract_parameters(self, func_declaration: str) -> List[str]:
         """関数のパラメータを抽出"""
         # 括弧内のパラメータを抽出
-        param_match = re.search(r'\(([^)]*)\)', func_declaration)
+        param_match = _PARAM_RE.search(func_declaration)
         if not param_match:
             return []
         
@@ -233,42 +345,44 @@ class CCodeParserTool(BaseTool):
         """構造体メンバーを解析"""
         members = []
         
-        # セミコロンで区切られた各メンバーを解析
-        member_lines = [line.strip() for line in struct_body.split(';') if line.strip()]
-        
-        for line in member_lines:
-            # 基本的な型と変数名のパターン
-            member_match = re.match(r'(\w+(?:\s*\*\s*)*)\s+(\w+)(?:\[.*?\])?', line)
-            if member_match:
-                member_type = member_match.group(1).strip()
-                member_name = member_match.group(2)
-                
-                members.append({
-                    "name": member_name,
-                    "type": member_type,
-                    "is_pointer": "*" in member_type,
-                    "is_array": "[" in line and "]" in line
-                })
+        # セミコロンで区切られた各メンバーを分割せずに1回の走査で解析
+        for member_match in _STRUCT_MEMBER_RE.finditer(struct_body):
+            member_type = member_match.group(1).strip()
+            member_name = member_match.group(2)
+            rest = member_match.group(3)
+            
+            members.append({
+                "name": member_name,
+                "type": member_type,
+                "is_pointer": "*" in member_type,
+                "is_array": "[" in rest and "]" in rest
+            })
         
         return members
     
     def _calculate_function_complexity(self, func_body: str) -> Dict[str, Any]:
         """関数の複雑度を計算"""
-        # サイクロマティック複雑度の計算
+        # 分岐キーワード・論理演算子・波括弧・改行を1回の走査で集計
         decision_points = 0
-        decision_points += func_body.count('if')
-        decision_points += func_body.count('while')
-        decision_points += func_body.count('for')
-        decision_points += func_body.count('switch')
-        decision_points += func_body.count('case')
-        decision_points += func_body.count('&&')
-        decision_points += func_body.count('||')
+        line_count = 0
+        current_level = 0
+        nested_level = 0
         
-        cyclomatic = decision_points + 1
+        for match in _COMPLEXITY_TOKEN_RE.finditer(func_body):
+            token = match.group()
+            if token == '\n':
+                line_count += 1
+            elif token == '{':
+                current_level += 1
+                if current_level > nested_level:
+                    nested_level = current_level
+            elif token == '}':
+                current_level -= 1
+            else:
+                decision_points += 1
         
-        # その他の複雑度指標
-        line_count = func_body.count('\n')
-        nested_level = self._calculate_nesting_level(func_body)
+        # サイクロマティック複雑度の計算
+        cyclomatic = decision_points + 1
         
         return {
             "cyclomatic_complexity": cyclomatic,
@@ -277,10 +391,8 @@ class CCodeParserTool(BaseTool):
             "complexity_rating": self._rate_complexity(cyclomatic, line_count, nested_level)
         }
     
-    def _calculate_file_complexity(self, content: str) -> Dict[str, Any]:
-        """ファイル全体の複雑度を計算"""
-        functions = self._extract_functions(content)
-        
+    def _calculate_file_complexity(self, functions: List[Dict]) -> Dict[str, Any]:
+        """ファイル全体の複雑度を計算（抽出済みの関数一覧から集計）"""
         if not functions:
             return {"average_complexity": 0, "max_complexity": 0, "total_functions": 0}
         
@@ -293,20 +405,6 @@ class CCodeParserTool(BaseTool):
             "complex_functions": len([c for c in complexities if c > 10])
         }
     
-    def _calculate_nesting_level(self, code: str) -> int:
-        """ネストレベルを計算"""
-        max_level = 0
-        current_level = 0
-        
-        for char in code:
-            if char == '{':
-                current_level += 1
-                max_level = max(max_level, current_level)
-            elif char == '}':
-                current_level -= 1
-        
-        return max_level
-    
     def _rate_complexity(self, cyclomatic: int, line_count: int, nesting: int) -> str:
         """複雑度を評価"""
         if cyclomatic > 20 or line_count > 100 or nesting > 5:
@@ -331,8 +429,17 @@ class CCodeParserTool(BaseTool):
             'scanf': 'より安全な入力方法を検討してください'
         }
         
+        # 危険な関数の呼び出しとmalloc/calloc/free/ifの出現回数を1回の走査で収集
+        used_funcs = set()
+        token_counts = Counter()
+        for match in _C_ISSUE_TOKEN_RE.finditer(content):
+            if match.group(1):
+                used_funcs.add(match.group(1))
+            else:
+                token_counts[match.group(2)] += 1
+        
         for func, suggestion in dangerous_funcs.items():
-            if func in content:
+            if func in used_funcs:
                 issues.append({
                     "type": "security",
                     "severity": "high",
@@ -342,8 +449,8 @@ class CCodeParserTool(BaseTool):
                 })
         
         # メモリリークの可能性
-        malloc_count = content.count('malloc') + content.count('calloc')
-        free_count = content.count('free')
+        malloc_count = token_counts['malloc'] + token_counts['calloc']
+        free_count = token_counts['free']
         if malloc_count > free_count:
             issues.append({
                 "type": "memory_leak",
@@ -353,7 +460,7 @@ class CCodeParserTool(BaseTool):
             })
         
         # NULLポインタチェックの不足
-        if 'malloc' in content and content.count('if') < content.count('malloc'):
+        if token_counts['malloc'] and token_counts['if'] < token_counts['malloc']:
             issues.append({
                 "type": "null_pointer",
                 "severity": "medium",
@@ -363,17 +470,29 @@ class CCodeParserTool(BaseTool):
         
         return issues
     
-    def _analyze_function_issues(self, func_body: str) -> List[str]:
+    def _analyze_function_issues(self, func_body: str, complexity: Dict[str, Any]) -> List[str]:
         """関数固有の問題を分析"""
         issues = []
         
-        if func_body.count('\n') > 50:
+        if complexity["line_count"] > 50:
             issues.append("関数が長すぎます（50行超）")
         
-        if self._calculate_function_complexity(func_body)["cyclomatic_complexity"] > 10:
+        if complexity["cyclomatic_complexity"] > 10:
             issues.append("複雑度が高すぎます（サイクロマティック複雑度 > 10）")
         
         if 'return' not in func_body and 'void' not in func_body:
             issues.append("戻り値が設定されていない可能性")
         
-        return issues
\ No newline at end of file
+        return issues
+
+
+# ワーカープロセスごとに再利用するパーサー
+_worker_parser: Optional[CCodeParserTool] = None
+
+
+def _parse_one(file_path: str) -> str:
+    """プロセスプールのワーカーで1ファイルを解析"""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = CCodeParserTool()
+    return _worker_parser._parse_file(file_path)
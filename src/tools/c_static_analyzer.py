@@ -3,9 +3,16 @@ C言語静的解析ツール
 cppcheck、clang-tidy等を使用した静的解析
 """
 
+import io
 import json
+import os
+import re
+from bisect import bisect_left
+from collections import deque
+import asyncio
 import subprocess
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any
 import logging
@@ -13,6 +20,75 @@ import logging
 from langchain.tools import BaseTool
 
 
+# メモリ割り当て後にNULLチェックを探す行数
+NULL_CHECK_WINDOW = 4
+
+# 危険な関数ごとの指摘内容
+_DANGEROUS_FUNCTIONS = {
+    'strcpy': {
+        'severity': 'high',
+        'message': 'strcpy()の使用はバッファオーバーフローの原因となります',
+        'suggestion': 'strncpy()またはstrlcpy()を使用してください'
+    },
+    'strcat': {
+        'severity': 'high', 
+        'message': 'strcat()の使用はバッファオーバーフローの原因となります',
+        'suggestion': 'strncat()またはstrlcat()を使用してください'
+    },
+    'sprintf': {
+        'severity': 'high',
+        'message': 'sprintf()の使用はバッファオーバーフローの原因となります',
+        'suggestion': 'snprintf()を使用してください'
+    },
+    'gets': {
+        'severity': 'critical',
+        'message': 'gets()は非常に危険な関数です',
+        'suggestion': 'fgets()を使用してください'
+    }
+}
+
+# 行コメントのみの行（行頭の空白に続く//）
+_LINE_COMMENT_RE = re.compile(r'[^\S\n]*//')
+# 120文字を超える行
+_LONG_LINE_RE = re.compile(r'^.{121,}$', re.MULTILINE)
+_NEWLINE_RE = re.compile(r'\n')
+# カスタム解析で追跡する字句（危険な関数・メモリ操作・ループ・NULL・数値・括弧類）
+# alloc_spaceは関数名と "(" の間の空白（ある場合はNULLチェック判定の対象外）
+# raw_allocは単語境界のない割り当て呼び出し（NULLチェック判定のみの対象）
+# magicはマジックナンバー候補（2桁以上の整数リテラル。10を超えるかは呼び出し側で判定）
+_CUSTOM_TOKEN_RE = re.compile(
+    r'(?P<dangerous>\b(?P<func>strcpy|strcat|sprintf|gets)\s*\()'
+    r'|(?P<alloc>\b(?:malloc|calloc)(?P<alloc_space>\s+)?\()|(?P<raw_alloc>(?:malloc|calloc)\()'
+    r'|(?P<free>\bfree\s*\()|(?P<loop>\b(?:for|while)\s*\()|(?P<do>\bdo\b)'
+    r'|(?P<null>NULL|null)|(?P<magic>\b\d{2,}\b)'
+    r'|(?P<open_paren>\()|(?P<close_paren>\))|(?P<semicolon>;)|(?P<open_brace>\{)|(?P<close_brace>\})'
+)
+# cppcheckのテキスト出力でエラー・警告を含む行
+_CPPCHECK_TEXT_ISSUE_RE = re.compile(r'error|warning', re.IGNORECASE)
+
+
+def _newline_offsets(content: str) -> List[int]:
+    """改行文字の位置を昇順に列挙（行番号の二分探索用）"""
+    return [match.start() for match in _NEWLINE_RE.finditer(content)]
+
+
+def _line_number(newlines: List[int], pos: int) -> int:
+    """文字位置を1始まりの行番号に変換"""
+    return bisect_left(newlines, pos) + 1
+
+
+def _line_start(newlines: List[int], line_number: int) -> int:
+    """1始まりの行番号に対応する行の先頭位置を取得"""
+    return newlines[line_number - 2] + 1 if line_number > 1 else 0
+
+
+def _line_text(content: str, newlines: List[int], line_number: int) -> str:
+    """1始まりの行番号に対応する行の内容を取得"""
+    start = _line_start(newlines, line_number)
+    end = newlines[line_number - 1] if line_number <= len(newlines) else len(content)
+    return content[start:end]
+
+
 class CStaticAnalysisTool(BaseTool):
     """C言語静的解析を実行するツール"""
     
@@ -23,42 +99,128 @@ class CStaticAnalysisTool(BaseTool):
         super().__init__()
         self.logger = logging.getLogger(__name__)
     
-    def _run(self, file_path: str) -> str:
-        """静的解析を実行"""
+    def _run(self, file_path: str = None, file_paths: List[str] = None) -> str:
+        """静的解析を実行（file_pathsを指定すると複数ファイルをまとめて解析）"""
         try:
-            if not Path(file_path).exists():
-                return json.dumps({"error": f"File not found: {file_path}"})
+            if file_paths:
+                results = {"files": [self._analyze_file(path) for path in file_paths]}
+            elif file_path:
+                results = self._analyze_file(file_path)
+            else:
+                return json.dumps({"error": "file_path or file_paths required"})
+            
+            return json.dumps(results, ensure_ascii=False, indent=2)
             
+        except Exception as e:
+            self.logger.error(f"Static analysis failed for {file_path or file_paths}: {e}")
+            return json.dumps({"error": str(e)})
+    
+    async def _arun(self, file_path: str = None, file_paths: List[str] = None) -> str:
+        """静的解析を非同期に実行（複数ファイルのcppcheckを同時に起動して待ち合わせる）"""
+        try:
+            if file_paths:
+                files = await asyncio.gather(*(self._aanalyze_file(path) for path in file_paths))
+                results = {"files": list(files)}
+            elif file_path:
+                results = await self._aanalyze_file(file_path)
+            else:
+                return json.dumps({"error": "file_path or file_paths required"})
+            
+            return json.dumps(results, ensure_ascii=False, indent=2)
+            
+        except Exception as e:
+            self.logger.error(f"Static analysis failed for {file_path or file_paths}: {e}")
+            return json.dumps({"error": str(e)})
+    
+    def _analyze_file(self, file_path: str) -> Dict:
+        """1ファイルの静的解析結果を作成"""
+        if not Path(file_path).exists():
+            return {"file_path": file_path, "error": f"File not found: {file_path}"}
+        
+        # cppcheckの待ち時間中にカスタム解析を進める
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            cppcheck_future = executor.submit(self._run_cppcheck, file_path)
+            custom_future = executor.submit(self._run_custom_analysis, file_path)
             results = {
                 "file_path": file_path,
-                "cppcheck_results": self._run_cppcheck(file_path),
-                "custom_analysis": self._run_custom_analysis(file_path),
+                "cppcheck_results": cppcheck_future.result(),
+                "custom_analysis": custom_future.result(),
                 "summary": {}
             }
+        
+        # サマリーを生成
+        results["summary"] = self._generate_summary(results)
+        return results
+    
+    async def _aanalyze_file(self, file_path: str) -> Dict:
+        """1ファイルの静的解析結果を非同期に作成（cppcheckの待ち時間中にカスタム解析を進める）"""
+        if not Path(file_path).exists():
+            return {"file_path": file_path, "error": f"File not found: {file_path}"}
+        
+        loop = asyncio.get_running_loop()
+        cppcheck_results, custom_analysis = await asyncio.gather(
+            self._arun_cppcheck(file_path),
+            loop.run_in_executor(None, self._run_custom_analysis, file_path)
+        )
+        
+        results = {
+            "file_path": file_path,
+            "cppcheck_results": cppcheck_results,
+            "custom_analysis": custom_analysis,
+            "summary": {}
+        }
+        
+        # サマリーを生成
+        results["summary"] = self._generate_summary(results)
+        return results
+    
+    def _cppcheck_command(self, file_path: str) -> List[str]:
+        """cppcheckのコマンドラインを作成"""
+        command = [
+            'cppcheck',
+            '--enable=all',
+            '--xml',
+            '--xml-version=2'
+        ]
+        
+        # ディレクトリ指定時はファイル単位で並列に解析させる
+        if Path(file_path).is_dir():
+            command.append(f'-j{os.cpu_count() or 1}')
+        
+        command.append(file_path)
+        return command
+    
+    async def _arun_cppcheck(self, file_path: str) -> List[Dict]:
+        """cppcheckによる静的解析（asyncioサブプロセス版）"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self._cppcheck_command(file_path),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
             
-            # サマリーを生成
-            results["summary"] = self._generate_summary(results)
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=60)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return [{"error": "cppcheck timeout"}]
             
-            return json.dumps(results, ensure_ascii=False, indent=2)
+            # XML結果を解析
+            xml_output = stderr.decode('utf-8', errors='replace')
+            return self._parse_cppcheck_xml(xml_output) if xml_output else []
             
+        except FileNotFoundError:
+            return [{"error": "cppcheck not found - please install cppcheck"}]
         except Exception as e:
-            self.logger.error(f"Static analysis failed for {file_path}: {e}")
-            return json.dumps({"error": str(e)})
+            return [{"error": f"cppcheck execution failed: {str(e)}"}]
     
     def _run_cppcheck(self, file_path: str) -> List[Dict]:
         """cppcheckによる静的解析"""
         try:
             # cppcheckコマンドを実行
-            cmd = [
-                'cppcheck',
-                '--enable=all',
-                '--xml',
-                '--xml-version=2',
-                file_path
-            ]
-            
             result = subprocess.run(
-                cmd, 
+                self._cppcheck_command(file_path), 
                 capture_output=True, 
                 text=True,
                 timeout=60
@@ -83,10 +245,11 @@ class CStaticAnalysisTool(BaseTool):
         issues = []
         
         try:
-            # XML要素として解析
-            root = ET.fromstring(xml_output)
-            
-            for error in root.findall('.//error'):
+            # DOM全体を保持せず、error要素ごとに逐次解析
+            for _, error in ET.iterparse(io.StringIO(xml_output), events=('end',)):
+                if error.tag != 'error':
+                    continue
+                
                 issue = {
                     "tool": "cppcheck",
                     "id": error.get('id', ''),
@@ -105,6 +268,7 @@ class CStaticAnalysisTool(BaseTool):
                     })
                 
                 issues.append(issue)
+                error.clear()
                 
         except ET.ParseError as e:
             # XMLパースに失敗した場合、テキストから情報を抽出
@@ -119,7 +283,7 @@ class CStaticAnalysisTool(BaseTool):
         
         lines = text_output.split('\n')
         for line in lines:
-            if 'error' in line.lower() or 'warning' in line.lower():
+            if _CPPCHECK_TEXT_ISSUE_RE.search(line):
                 issues.append({
                     "tool": "cppcheck",
                     "severity": "unknown",
@@ -137,11 +301,11 @@ class CStaticAnalysisTool(BaseTool):
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
+            # 各チェックで共有する改行位置の索引を一度だけ作成
+            newlines = _newline_offsets(content)
+            
             # C言語特有のパターンをチェック
-            issues.extend(self._check_security_patterns(content, file_path))
-            issues.extend(self._check_memory_patterns(content, file_path))
-            issues.extend(self._check_performance_patterns(content, file_path))
-            issues.extend(self._check_style_patterns(content, file_path))
+            issues.extend(self._scan_custom_patterns(content, newlines))
             
         except Exception as e:
             issues.append({
@@ -152,167 +316,181 @@ class CStaticAnalysisTool(BaseTool):
         
         return issues
     
-    def _check_security_patterns(self, content: str, file_path: str) -> List[Dict]:
-        """セキュリティパターンをチェック"""
-        issues = []
-        lines = content.split('\n')
+    def _scan_custom_patterns(self, content: str, newlines: List[int]) -> List[Dict]:
+        """セキュリティ・メモリ・パフォーマンス・スタイルの各パターンを1回の走査でチェック"""
+        security_issues = []
+        memory_issues = []
+        performance_issues = []
         
-        # 危険な関数の使用チェック
-        dangerous_functions = {
-            'strcpy': {
-                'severity': 'high',
-                'message': 'strcpy()の使用はバッファオーバーフローの原因となります',
-                'suggestion': 'strncpy()またはstrlcpy()を使用してください'
-            },
-            'strcat': {
-                'severity': 'high', 
-                'message': 'strcat()の使用はバッファオーバーフローの原因となります',
-                'suggestion': 'strncat()またはstrlcat()を使用してください'
-            },
-            'sprintf': {
-                'severity': 'high',
-                'message': 'sprintf()の使用はバッファオーバーフローの原因となります',
-                'suggestion': 'snprintf()を使用してください'
-            },
-            'gets': {
-                'severity': 'critical',
-                'message': 'gets()は非常に危険な関数です',
-                'suggestion': 'fgets()を使用してください'
-            }
-        }
+        # セキュリティ: 同じ行の同じ危険関数は1件にまとめる
+        dangerous_seen = set()
+        # メモリ: 割り当て・解放を含む行と、NULLチェック待ちの割り当て行
+        alloc_lines = set()
+        free_lines = set()
+        pending = deque()
+        # パフォーマンス: ループ・括弧の対応を追跡
+        brace_depth = 0
+        paren_depth = 0
+        loop_body_depths = []  # ループ本体の波括弧の深さ
+        loop_pending = False   # ループ文の後、本体の開始を待っている状態
+        loop_alloc_lines = set()
+        # スタイル: 1行につき1件のマジックナンバー
+        issues_by_line = {}
+        magic_lines = set()
         
-        for i, line in enumerate(lines):
-            for func, info in dangerous_functions.items():
-                if func + '(' in line:
-                    issues.append({
+        for match in _CUSTOM_TOKEN_RE.finditer(content):
+            kind = match.lastgroup
+            
+            # 1文字の字句は行番号を求めずに処理
+            if kind == 'open_paren':
+                paren_depth += 1
+                continue
+            if kind == 'close_paren':
+                paren_depth = max(0, paren_depth - 1)
+                continue
+            if kind == 'semicolon':
+                # 波括弧のないループ本体（do-whileの末尾を含む）は文の終わりで終了
+                if paren_depth == 0:
+                    loop_pending = False
+                continue
+            if kind == 'open_brace':
+                brace_depth += 1
+                if loop_pending:
+                    loop_body_depths.append(brace_depth)
+                    loop_pending = False
+                continue
+            if kind == 'close_brace':
+                if loop_body_depths and loop_body_depths[-1] == brace_depth:
+                    loop_body_depths.pop()
+                brace_depth -= 1
+                continue
+            if kind == 'do':
+                loop_pending = True
+                continue
+            if kind == 'magic' and int(match.group()) <= 10:
+                continue
+            
+            line_number = _line_number(newlines, match.start())
+            
+            if kind == 'null' or kind == 'alloc' or kind == 'raw_alloc':
+                # 確認範囲を過ぎた割り当てはNULLチェックなしとして報告
+                while pending and line_number > pending[0][0] + NULL_CHECK_WINDOW:
+                    memory_issues.append(self._null_check_issue(*pending.popleft()))
+            
+            if kind == 'null':
+                # 同じ行の割り当ては後続行のNULLチェックを待つ
+                while pending and pending[0][0] < line_number:
+                    pending.popleft()
+            
+            elif kind == 'loop':
+                loop_pending = True
+                paren_depth += 1
+            
+            elif kind == 'magic':
+                if line_number in magic_lines:
+                    continue
+                # コメント行は行を切り出さずに元の文字列上で判定
+                if _LINE_COMMENT_RE.match(content, _line_start(newlines, line_number)):
+                    continue
+                
+                magic_lines.add(line_number)
+                issues_by_line.setdefault(line_number, []).append({
+                    "tool": "custom", 
+                    "category": "style",
+                    "severity": "low",
+                    "line": line_number,
+                    "message": "マジックナンバーの可能性があります",
+                    "suggestion": "定数または#defineを使用してください",
+                    "code_snippet": _line_text(content, newlines, line_number).strip()
+                })
+            
+            elif kind == 'dangerous':
+                paren_depth += 1
+                func = match.group('func')
+                if (line_number, func) in dangerous_seen:
+                    continue
+                dangerous_seen.add((line_number, func))
+                
+                info = _DANGEROUS_FUNCTIONS[func]
+                security_issues.append({
+                    "tool": "custom",
+                    "category": "security",
+                    "severity": info['severity'],
+                    "line": line_number,
+                    "message": info['message'],
+                    "suggestion": info['suggestion'],
+                    "code_snippet": _line_text(content, newlines, line_number).strip()
+                })
+            
+            elif kind == 'free':
+                paren_depth += 1
+                free_lines.add(line_number)
+            
+            else:
+                paren_depth += 1
+                
+                # NULLチェックの対象は関数名と括弧の間に空白のない呼び出し（raw_alloc は常に空白なし）
+                no_space_call = kind == 'raw_alloc' or match.group('alloc_space') is None
+                if no_space_call and not (pending and pending[-1][0] == line_number):
+                    line = _line_text(content, newlines, line_number)
+                    if '=' in line:
+                        pending.append((line_number, line))
+                
+                if kind == 'raw_alloc':
+                    continue
+                alloc_lines.add(line_number)
+                
+                if (loop_body_depths or loop_pending) and line_number not in loop_alloc_lines:
+                    loop_alloc_lines.add(line_number)
+                    performance_issues.append({
                         "tool": "custom",
-                        "category": "security",
-                        "severity": info['severity'],
-                        "line": i + 1,
-                        "message": info['message'],
-                        "suggestion": info['suggestion'],
-                        "code_snippet": line.strip()
+                        "category": "performance",
+                        "severity": "medium",
+                        "line": line_number,
+                        "message": "ループ内でメモリ割り当てを実行しています",
+                        "suggestion": "可能であればループ外でメモリを事前割り当てしてください",
+                        "code_snippet": _line_text(content, newlines, line_number).strip()
                     })
         
-        return issues
-    
-    def _check_memory_patterns(self, content: str, file_path: str) -> List[Dict]:
-        """メモリ管理パターンをチェック"""
-        issues = []
-        lines = content.split('\n')
+        memory_issues.extend(self._null_check_issue(line_number, line) for line_number, line in pending)
         
-        # malloc/freeのペアをチェック
-        malloc_lines = []
-        free_lines = []
-        
-        for i, line in enumerate(lines):
-            if 'malloc(' in line or 'calloc(' in line:
-                malloc_lines.append(i + 1)
-            if 'free(' in line:
-                free_lines.append(i + 1)
-        
-        # malloc/freeの数が合わない場合
-        if len(malloc_lines) > len(free_lines):
-            issues.append({
+        # malloc/freeの数が合わない場合（呼び出しを含む行を数える）
+        if len(alloc_lines) > len(free_lines):
+            memory_issues.insert(0, {
                 "tool": "custom",
                 "category": "memory",
                 "severity": "medium",
-                "message": f"malloc/calloc({len(malloc_lines)})とfree({len(free_lines)})の数が不一致",
+                "message": f"malloc/calloc({len(alloc_lines)})とfree({len(free_lines)})の数が不一致",
                 "suggestion": "メモリリークの可能性があります。全てのmallocに対応するfreeを確認してください"
             })
         
-        # NULLポインタチェックの不足
-        for i, line in enumerate(lines):
-            if ('malloc(' in line or 'calloc(' in line) and '=' in line:
-                # 次の数行でNULLチェックがあるかを確認
-                null_check_found = False
-                for j in range(i + 1, min(i + 5, len(lines))):
-                    if 'NULL' in lines[j] or 'null' in lines[j]:
-                        null_check_found = True
-                        break
-                
-                if not null_check_found:
-                    issues.append({
-                        "tool": "custom",
-                        "category": "memory",
-                        "severity": "medium",
-                        "line": i + 1,
-                        "message": "malloc/calloc後のNULLチェックがありません",
-                        "suggestion": "メモリ割り当て失敗時の処理を追加してください",
-                        "code_snippet": line.strip()
-                    })
-        
-        return issues
-    
-    def _check_performance_patterns(self, content: str, file_path: str) -> List[Dict]:
-        """パフォーマンスパターンをチェック"""
-        issues = []
-        lines = content.split('\n')
-        
-        # ループ内でのmalloc
-        in_loop = False
-        loop_depth = 0
+        # 長すぎる行（行頭・行末に固定した判定のため別の走査で検出）
+        for match in _LONG_LINE_RE.finditer(content):
+            line_number = _line_number(newlines, match.start())
+            issues_by_line.setdefault(line_number, []).insert(0, {
+                "tool": "custom",
+                "category": "style",
+                "severity": "low",
+                "line": line_number,
+                "message": "行が長すぎます（120文字超）",
+                "suggestion": "行を分割して可読性を向上させてください"
+            })
         
-        for i, line in enumerate(lines):
-            line_clean = line.strip()
-            
-            # ループの検出
-            if any(keyword in line_clean for keyword in ['for(', 'while(', 'do{']):
-                in_loop = True
-                loop_depth += 1
-            elif '}' in line_clean and in_loop:
-                loop_depth -= 1
-                if loop_depth == 0:
-                    in_loop = False
-            
-            # ループ内でのメモリ割り当て
-            if in_loop and ('malloc(' in line or 'calloc(' in line):
-                issues.append({
-                    "tool": "custom",
-                    "category": "performance",
-                    "severity": "medium",
-                    "line": i + 1,
-                    "message": "ループ内でメモリ割り当てを実行しています",
-                    "suggestion": "可能であればループ外でメモリを事前割り当てしてください",
-                    "code_snippet": line.strip()
-                })
+        style_issues = [issue for line_number in sorted(issues_by_line) for issue in issues_by_line[line_number]]
         
-        return issues
+        return security_issues + memory_issues + performance_issues + style_issues
     
-    def _check_style_patterns(self, content: str, file_path: str) -> List[Dict]:
-        """コードスタイルパターンをチェック"""
-        issues = []
-        lines = content.split('\n')
-        
-        for i, line in enumerate(lines):
-            # 長すぎる行
-            if len(line) > 120:
-                issues.append({
-                    "tool": "custom",
-                    "category": "style",
-                    "severity": "low",
-                    "line": i + 1,
-                    "message": "行が長すぎます（120文字超）",
-                    "suggestion": "行を分割して可読性を向上させてください"
-                })
-            
-            # ハードコードされた数値
-            if any(char.isdigit() for char in line) and not line.strip().startswith('//'):
-                # マジックナンバーの検出（簡易版）
-                import re
-                numbers = re.findall(r'\b\d+\b', line)
-                if any(int(num) > 10 for num in numbers if num.isdigit()):
-                    issues.append({
-                        "tool": "custom", 
-                        "category": "style",
-                        "severity": "low",
-                        "line": i + 1,
-                        "message": "マジックナンバーの可能性があります",
-                        "suggestion": "定数または#defineを使用してください",
-                        "code_snippet": line.strip()
-                    })
-        
-        return issues
+    def _null_check_issue(self, line_number: int, line: str) -> Dict:
+        """NULLチェック不足の指摘を作成"""
+        return {
+            "tool": "custom",
+            "category": "memory",
+            "severity": "medium",
+            "line": line_number,
+            "message": "malloc/calloc後のNULLチェックがありません",
+            "suggestion": "メモリ割り当て失敗時の処理を追加してください",
+            "code_snippet": line.strip()
+        }
     
     def _generate_summary(self, results: Dict) -> Dict:
         """解析結果のサマリーを生成"""
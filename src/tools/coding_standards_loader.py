@@ -3,31 +3,258 @@
 PDF, Markdown, テキストファイルからレビュー観点を抽出
 """
 
+import os
 import re
 import json
+import hashlib
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Pattern, Tuple
 import logging
 
-import PyPDF2
 import markdown
+import orjson
+import pypdfium2 as pdfium
 from bs4 import BeautifulSoup
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
 
+# 解析結果キャッシュの形式バージョン（解析ロジックを変えた場合に上げて古いキャッシュを無効化）
+STANDARDS_CACHE_VERSION = 1
+# ベクトルストアキャッシュの形式バージョン（インデックスの構成を変えた場合に上げる）
+VECTORSTORE_CACHE_VERSION = 2
+# 埋め込みに使用するモデルとエンコード設定（まとめてバッチ計算し、正規化したベクトルを格納）
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_ENCODE_KWARGS = {"batch_size": 128, "normalize_embeddings": True}
+
+# レビュー観点とみなす行（リストマーカー・番号付きリスト・チェックボックス、または指示形式）
+_REVIEW_POINT_RE = re.compile(
+    r'^(?:[-*•・○●] |\d+[.)]\s)'
+    r'|(?:すること|べき|する|してください)$|を確認|をチェック|を検証'
+)
+# レビュー観点の先頭から除去するマーカー（リストマーカー、番号、チェックボックスの順）
+_REVIEW_POINT_PREFIX_RE = re.compile(r'^(?:[-*•・○●]\s*)?(?:\d+[.)]\s*)?(?:- \[[ x]\]\s*)?')
+
+# カテゴリ見出しの判定に使うキーワード（先に一致したカテゴリを優先）
+_CATEGORY_KEYWORDS = (
+    ("security", ('セキュリティ', 'security', 'セキュリティー', '脆弱性')),
+    ("memory_management", ('メモリ', 'memory', 'メモリー', 'malloc', 'free')),
+    ("performance", ('パフォーマンス', 'performance', '性能', '最適化', 'optimization')),
+    ("code_quality", ('品質', 'quality', 'コード品質', 'code quality')),
+    ("error_handling", ('エラー', 'error', 'エラーハンドリング', 'error handling', '例外')),
+)
+
+# 高優先度キーワード
+_HIGH_PRIORITY_KEYWORDS = (
+    'バッファオーバーフロー', 'buffer overflow', 'セキュリティ', 'security',
+    'メモリリーク', 'memory leak', 'null pointer', 'ヌルポインタ',
+    '危険', 'danger', 'critical', 'クリティカル'
+)
+
+# 中優先度キーワード
+_MEDIUM_PRIORITY_KEYWORDS = (
+    'パフォーマンス', 'performance', '最適化', 'optimization',
+    'エラーハンドリング', 'error handling', '例外処理'
+)
+
+
+def _keyword_scanner(groups: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> Pattern[str]:
+    """(グループ名, キーワード群) の組から全キーワードを1回の走査で検出する正規表現を作成"""
+    # 先読みの中で照合し、重なり合うキーワードも位置ごとに検出する
+    alternatives = '|'.join(
+        f"(?P<{name}>{'|'.join(map(re.escape, keywords))})" for name, keywords in groups
+    )
+    return re.compile(f"(?=(?:{alternatives}))")
+
+
+# カテゴリ・優先度のキーワードをそれぞれ1回の走査で検出
+_CATEGORY_RE = _keyword_scanner(_CATEGORY_KEYWORDS)
+_PRIORITY_RE = _keyword_scanner((
+    ("high", _HIGH_PRIORITY_KEYWORDS),
+    ("medium", _MEDIUM_PRIORITY_KEYWORDS),
+))
+
+# カテゴリ見出しまたはレビュー観点になり得る行の候補（行ごとの厳密な判定の前に全文を1回で絞り込む）
+# 大文字小文字を無視した照合は、小文字化した行に対するキーワード判定を必ず包含する
+_CANDIDATE_LINE_RE = re.compile(
+    r'^[^\S\n]*(?:[-*•・○●]|\d)|すること|べき|する|してください|を確認|をチェック|を検証|'
+    + '|'.join(re.escape(keyword) for _, keywords in _CATEGORY_KEYWORDS for keyword in keywords),
+    re.MULTILINE | re.IGNORECASE
+)
+
+
+def _iter_candidate_lines(content: str) -> Iterator[str]:
+    """見出し・レビュー観点の候補となる行を、前後の空白を除いて順に列挙"""
+    pos = 0
+    while True:
+        match = _CANDIDATE_LINE_RE.search(content, pos)
+        if not match:
+            return
+        
+        # 一致位置を含む行を切り出し、次の検索は次の行の先頭から始める
+        newline = content.rfind('\n', pos, match.start())
+        start = newline + 1 if newline >= 0 else pos
+        end = content.find('\n', match.start())
+        if end < 0:
+            end = len(content)
+        
+        line = content[start:end].strip()
+        if line:
+            yield line
+        pos = end + 1
+
+
+def _filter_candidate_lines(lines: Iterable[str]) -> Iterator[str]:
+    """行の並びから見出し・レビュー観点の候補となる行を、前後の空白を除いて順に列挙"""
+    for line in lines:
+        if _CANDIDATE_LINE_RE.search(line):
+            line = line.strip()
+            if line:
+                yield line
+
+
+# ファイルのハッシュ計算で一度に読み込むサイズ
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# この数以上の観点はHNSWインデックスで近似検索する（少数なら全件比較の方が速く正確）
+HNSW_MIN_DOCUMENTS = 1000
+# HNSWグラフの各ノードの接続数と、構築時・検索時の探索幅
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# この数以上のページを持つPDFはプロセスプールで並列に抽出する
+PARALLEL_PDF_PAGE_THRESHOLD = 20
+# 1ワーカーあたりの最小ページ数（プロセス起動コストに見合う分量）
+PARALLEL_PDF_MIN_PAGES_PER_WORKER = 10
+
+# PDFiumは別々の文書であってもスレッドセーフではないため、プロセス内でのPDFiumの利用をこのロックで直列化する
+_PDFIUM_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _embedding_device() -> str:
+    """埋め込み計算に使うデバイス（CUDAが利用できればGPU）"""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+@lru_cache(maxsize=4)
+def _get_embedder(model_name: str, device: str) -> HuggingFaceEmbeddings:
+    """埋め込みモデルを読み込み（同じモデル・デバイスでは読み込み済みのインスタンスを再利用）"""
+    embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": device},
+        encode_kwargs=dict(EMBEDDING_ENCODE_KWARGS)
+    )
+    if device == "cuda":
+        # GPUでは半精度で計算してメモリ帯域とVRAMを削減
+        embeddings.client.half()
+    return embeddings
+
+
+class TEIEmbeddings(Embeddings):
+    """text-embeddings-inference (TEI) サーバーのHTTP APIで埋め込みを計算"""
+    
+    def __init__(self, base_url: str, batch_size: int = EMBEDDING_ENCODE_KWARGS["batch_size"],
+                 max_workers: int = 4, timeout: float = 60.0):
+        self.base_url = base_url.rstrip('/')
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """文書の埋め込みをバッチに分けて取得（サーバー側の動的バッチングを活かすため並行に送信）"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._embed_batch(batches[0]) if batches else []
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            return [vector for vectors in executor.map(self._embed_batch, batches) for vector in vectors]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """検索クエリの埋め込みを取得"""
+        return self._embed_batch([text])[0]
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """1バッチ分のテキストを /embed に送信"""
+        request = urllib.request.Request(
+            f"{self.base_url}/embed",
+            data=orjson.dumps({
+                "inputs": texts,
+                "normalize": EMBEDDING_ENCODE_KWARGS["normalize_embeddings"]
+            }),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return orjson.loads(response.read())
+
+
+def _build_hnsw_vectorstore(documents: List[str], metadatas: List[Dict], embeddings: Embeddings) -> FAISS:
+    """HNSWインデックスを使うベクトルストアを作成（検索が観点数に対して対数時間になる）"""
+    import faiss
+    import numpy as np
+    
+    vectors = np.asarray(embeddings.embed_documents(documents), dtype='float32')
+    index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    index.add(vectors)
+    
+    docstore = InMemoryDocstore({
+        str(i): Document(page_content=text, metadata=metadata)
+        for i, (text, metadata) in enumerate(zip(documents, metadatas))
+    })
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id={i: str(i) for i in range(len(documents))}
+    )
+
+
+def _extract_page_texts(pdf: "pdfium.PdfDocument", start: int, stop: int) -> str:
+    """開いたPDFの指定ページ範囲からテキストを抽出"""
+    texts = []
+    for index in range(start, stop):
+        page = pdf[index]
+        textpage = page.get_textpage()
+        texts.append(textpage.get_text_range() + "\n")
+        textpage.close()
+        page.close()
+    return "".join(texts)
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> str:
+    """プロセスプールのワーカーでPDFの指定ページ範囲からテキストを抽出"""
+    # ワーカーはロックを保持した親からforkされるためロックは取得しない（プロセスごとに独立したPDFiumを使う）
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return _extract_page_texts(pdf, start, stop)
+    finally:
+        pdf.close()
+
+
 class CodingStandardsLoader:
     """コーディング規約ファイルの読み込みと解析"""
     
-    def __init__(self):
+    def __init__(self, cache_dir: Optional[str] = None):
         self.supported_formats = ['.pdf', '.txt', '.md']
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", "。", ".", " "]
-        )
         self.logger = logging.getLogger(__name__)
+        
+        # 解析済みの規約とベクトルストアのキャッシュ先
+        if cache_dir:
+            self.cache_dir = Path(cache_dir)
+        else:
+            self.cache_dir = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "coding_standards"
     
     def load_standards_from_file(self, file_path: str) -> Dict[str, List[Dict]]:
         """ファイルからコーディング規約を読み込み"""
@@ -36,20 +263,60 @@ class CodingStandardsLoader:
         
         self.logger.info(f"Loading standards from: {file_path}")
         
+        # 内容が同じファイルは前回の解析結果をディスクキャッシュから読み込む
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        
+        # 解析方法はファイル形式ごとに異なるため、同じ内容でも形式が違えば別のキャッシュにする
         file_ext = Path(file_path).suffix.lower()
+        cache_file = self.cache_dir / f"v{STANDARDS_CACHE_VERSION}-{file_ext.lstrip('.')}-{digest}.json"
         
+        cached = self._read_cache(cache_file)
+        if cached is not None:
+            self.logger.info(f"Using cached standards for: {file_path}")
+            return cached
+        
+        # コンテンツを解析して構造化（テキストファイルは全体を読み込まずに行単位で解析）
         if file_ext == '.pdf':
-            content = self._extract_from_pdf(file_path)
+            structured_standards = self._parse_standards_content(self._extract_from_pdf(file_path))
         elif file_ext == '.md':
-            content = self._extract_from_markdown(file_path)
+            structured_standards = self._parse_standards_content(self._extract_from_markdown(file_path))
         elif file_ext == '.txt':
-            content = self._extract_from_text(file_path)
+            structured_standards = self._parse_standards_lines(_filter_candidate_lines(self._extract_from_text(file_path)))
         
-        # コンテンツを解析して構造化
-        structured_standards = self._parse_standards_content(content)
+        self._write_cache(cache_file, orjson.dumps(structured_standards))
         
         return structured_standards
     
+    def _read_cache(self, cache_file: Path) -> Optional[Dict[str, List[Dict]]]:
+        """キャッシュファイルを読み込み（存在しない・壊れている場合はNone）"""
+        try:
+            with open(cache_file, 'rb') as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, orjson.JSONDecodeError) as e:
+            self.logger.warning(f"Ignoring unreadable standards cache {cache_file}: {e}")
+            return None
+    
+    def _write_cache(self, cache_file: Path, content: bytes):
+        """キャッシュファイルを一時ファイル経由で書き込み（失敗しても読み込み自体は継続）"""
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_file.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, cache_file)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+        except OSError as e:
+            self.logger.warning(f"Failed to write standards cache {cache_file}: {e}")
+    
     def _is_supported_format(self, file_path: str) -> bool:
         """対応ファイル形式かチェック"""
         return any(file_path.lower().endswith(fmt) for fmt in self.supported_formats)
@@ -57,16 +324,36 @@ class CodingStandardsLoader:
     def _extract_from_pdf(self, file_path: str) -> str:
         """PDFからテキストを抽出"""
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
+            # 他のスレッドのPDFium呼び出しと重ならないよう、ワーカーのforkを含めてロックを保持したまま抽出
+            with _PDFIUM_LOCK:
+                return self._extract_pdf_text(file_path)
         except Exception as e:
             self.logger.error(f"Failed to read PDF {file_path}: {e}")
             raise
     
+    def _extract_pdf_text(self, file_path: str) -> str:
+        """PDFiumでページごとにテキストを抽出（_PDFIUM_LOCK を保持して呼び出すこと）"""
+        # ネイティブのPDFiumでページごとにテキストを抽出
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            page_count = len(pdf)
+            workers = min(os.cpu_count() or 1, page_count // PARALLEL_PDF_MIN_PAGES_PER_WORKER)
+            if page_count < PARALLEL_PDF_PAGE_THRESHOLD or workers < 2:
+                return _extract_page_texts(pdf, 0, page_count)
+        finally:
+            pdf.close()
+        
+        # ページ数の多いPDFはページ範囲ごとにプロセスを分けて抽出し、ページ順に結合
+        # （PDFiumのオブジェクトはpickleできないため、各ワーカーでファイルを開き直す）
+        bounds = [page_count * i // workers for i in range(workers + 1)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return "".join(executor.map(
+                _extract_page_range,
+                [file_path] * workers,
+                bounds[:-1],
+                bounds[1:]
+            ))
+    
     def _extract_from_markdown(self, file_path: str) -> str:
         """Markdownファイルからテキストを抽出"""
         try:
@@ -81,17 +368,22 @@ class CodingStandardsLoader:
             self.logger.error(f"Failed to read Markdown {file_path}: {e}")
             raise
     
-    def _extract_from_text(self, file_path: str) -> str:
-        """テキストファイルを読み込み"""
+    def _extract_from_text(self, file_path: str) -> Iterator[str]:
+        """テキストファイルを1行ずつ読み込み"""
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+                yield from file
         except Exception as e:
             self.logger.error(f"Failed to read text file {file_path}: {e}")
             raise
     
     def _parse_standards_content(self, content: str) -> Dict[str, List[Dict]]:
         """コンテンツを解析してレビュー観点を構造化"""
+        # 見出し・観点になり得ない行は全文の走査で読み飛ばす
+        return self._parse_standards_lines(_iter_candidate_lines(content))
+    
+    def _parse_standards_lines(self, lines: Iterable[str]) -> Dict[str, List[Dict]]:
+        """前後の空白を除いた候補行の並びを解析してレビュー観点を構造化"""
         standards = {
             "security": [],
             "memory_management": [],
@@ -103,13 +395,8 @@ class CodingStandardsLoader:
         
         # セクション別に解析
         current_category = "custom"
-        lines = content.split('\n')
         
         for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
             # カテゴリの検出
             category = self._detect_category(line)
             if category:
@@ -132,87 +419,33 @@ class CodingStandardsLoader:
     
     def _detect_category(self, line: str) -> str:
         """行からカテゴリを検出"""
-        line_lower = line.lower()
-        
-        if any(keyword in line_lower for keyword in [
-            'セキュリティ', 'security', 'セキュリティー', '脆弱性'
-        ]):
-            return "security"
-        elif any(keyword in line_lower for keyword in [
-            'メモリ', 'memory', 'メモリー', 'malloc', 'free'
-        ]):
-            return "memory_management"
-        elif any(keyword in line_lower for keyword in [
-            'パフォーマンス', 'performance', '性能', '最適化', 'optimization'
-        ]):
-            return "performance"
-        elif any(keyword in line_lower for keyword in [
-            '品質', 'quality', 'コード品質', 'code quality'
-        ]):
-            return "code_quality"
-        elif any(keyword in line_lower for keyword in [
-            'エラー', 'error', 'エラーハンドリング', 'error handling', '例外'
-        ]):
-            return "error_handling"
+        found = {match.lastgroup for match in _CATEGORY_RE.finditer(line.lower())}
+        
+        if found:
+            # 複数のカテゴリに一致した場合は定義順で先のカテゴリを優先
+            for category, _ in _CATEGORY_KEYWORDS:
+                if category in found:
+                    return category
         
         return None
     
     def _is_review_point(self, line: str) -> bool:
         """レビュー観点として認識すべき行かチェック"""
-        # リスト項目のマーカー
-        list_markers = ['-', '*', '•', '・', '○', '●']
-        
-        # 行の最初がリストマーカーで始まるかチェック
-        if any(line.startswith(marker + ' ') for marker in list_markers):
-            return True
-        
-        # 番号付きリスト
-        if re.match(r'^\d+[.\)]\s', line):
-            return True
-        
-        # チェックボックス形式
-        if re.match(r'^- \[[ x]\]', line):
-            return True
-        
-        # 「〜すること」「〜べき」「〜する」などの指示形式
-        directive_patterns = [
-            r'.*すること$', r'.*べき$', r'.*する$', r'.*してください$',
-            r'.*を確認', r'.*をチェック', r'.*を検証'
-        ]
-        if any(re.search(pattern, line) for pattern in directive_patterns):
-            return True
-        
-        return False
+        # リストマーカー・番号付きリスト・チェックボックス・指示形式を1回の検索で判定
+        return _REVIEW_POINT_RE.search(line) is not None
     
     def _clean_review_point(self, line: str) -> str:
         """レビュー観点のテキストをクリーンアップ"""
         # リストマーカーを除去
-        line = re.sub(r'^[-*•・○●]\s*', '', line)
-        line = re.sub(r'^\d+[.\)]\s*', '', line)
-        line = re.sub(r'^- \[[ x]\]\s*', '', line)
-        
-        return line.strip()
+        return _REVIEW_POINT_PREFIX_RE.sub('', line, count=1).strip()
     
     def _determine_priority(self, point: str) -> str:
         """レビュー観点の優先度を判定"""
-        point_lower = point.lower()
-        
-        # 高優先度キーワード
-        high_priority_keywords = [
-            'バッファオーバーフロー', 'buffer overflow', 'セキュリティ', 'security',
-            'メモリリーク', 'memory leak', 'null pointer', 'ヌルポインタ',
-            '危険', 'danger', 'critical', 'クリティカル'
-        ]
-        
-        # 中優先度キーワード
-        medium_priority_keywords = [
-            'パフォーマンス', 'performance', '最適化', 'optimization',
-            'エラーハンドリング', 'error handling', '例外処理'
-        ]
-        
-        if any(keyword in point_lower for keyword in high_priority_keywords):
+        found = {match.lastgroup for match in _PRIORITY_RE.finditer(point.lower())}
+        
+        if "high" in found:
             return "high"
-        elif any(keyword in point_lower for keyword in medium_priority_keywords):
+        elif "medium" in found:
             return "medium"
         else:
             return "low"
@@ -220,24 +453,49 @@ class CodingStandardsLoader:
     def create_vectorstore(self, standards: Dict[str, List[Dict]]) -> FAISS:
         """レビュー観点からベクトルストアを作成"""
         try:
-            # 全ての観点をテキストとして結合
+            # 全ての観点をテキストとして結合（カテゴリ・優先度は検索時の絞り込み用にメタデータにも保持）
             documents = []
+            metadatas = []
             for category, points in standards.items():
                 for point in points:
                     doc_text = f"カテゴリ: {category}\n説明: {point['description']}\n優先度: {point['priority']}"
                     documents.append(doc_text)
+                    metadatas.append({"category": category, "priority": point['priority']})
             
             if not documents:
                 raise ValueError("No standards documents to process")
             
-            # テキストを分割
-            splits = self.text_splitter.create_documents(documents)
+            # TEI_URL が設定されていれば text-embeddings-inference サーバーで埋め込みを計算
+            tei_url = os.environ.get("TEI_URL")
+            if tei_url:
+                embeddings = TEIEmbeddings(tei_url)
+                embedding_key = f"tei:{tei_url}"
+            else:
+                embeddings = _get_embedder(EMBEDDING_MODEL_NAME, _embedding_device())
+                embedding_key = EMBEDDING_MODEL_NAME
+            
+            # 同じ観点・モデル・エンコード設定から作成済みのインデックスはディスクから読み込む
+            embedding_key = f"{embedding_key}|{sorted(EMBEDDING_ENCODE_KWARGS.items())}"
+            hasher = hashlib.blake2b(embedding_key.encode('utf-8'), digest_size=16)
+            for doc_text in documents:
+                hasher.update(b"\0" + doc_text.encode('utf-8'))
+            index_dir = self.cache_dir / "vectorstores" / f"v{VECTORSTORE_CACHE_VERSION}-{hasher.hexdigest()}"
+            
+            # save_localはindex.faiss、index.pklの順に書き込むため、index.pklの有無で保存完了を判定
+            if (index_dir / "index.pkl").exists():
+                # 自身が保存したインデックスのみを読み込むため、pickleの復元を許可する
+                return FAISS.load_local(str(index_dir), embeddings, allow_dangerous_deserialization=True)
+            
+            # ベクトルストアを作成（各観点は短い3行のテキストのため分割せずにそのまま埋め込む）
+            if len(documents) >= HNSW_MIN_DOCUMENTS:
+                vectorstore = _build_hnsw_vectorstore(documents, metadatas, embeddings)
+            else:
+                vectorstore = FAISS.from_texts(documents, embeddings, metadatas=metadatas)
             
-            # ベクトルストアを作成
-            embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2"
-            )
-            vectorstore = FAISS.from_documents(splits, embeddings)
+            try:
+                vectorstore.save_local(str(index_dir))
+            except OSError as e:
+                self.logger.warning(f"Failed to cache vectorstore {index_dir}: {e}")
             
             return vectorstore
             
@@ -5,13 +5,29 @@
 
 import json
 import logging
+import os
+import re
+import stat
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 
-from git import Repo, GitCommandError
+import orjson
+from git import NULL_TREE, Repo, GitCommandError
 from langchain.tools import BaseTool
 
+# コミット変更内容のキャッシュ件数上限（コミットの内容は不変のためハッシュ単位で再利用）
+COMMIT_CACHE_SIZE = 256
+
+# C言語ファイルとして扱う拡張子（先頭の "." を除いた小文字）
+_C_EXTS = frozenset({'c', 'h', 'cc', 'cpp', 'cxx', 'hpp'})
+
+# git ls-files に渡すC言語ファイルのパス指定（拡張子の大文字・小文字は区別しない）
+_C_FILE_PATHSPECS = tuple(f':(icase)*.{ext}' for ext in sorted(_C_EXTS))
+
+# ハンクヘッダ（@@ -a,b +c,d @@）
+_HUNK_RE = re.compile(r'@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@')
+
 
 class LocalGitTool(BaseTool):
     """ローカルGitリポジトリの解析ツール"""
@@ -23,6 +39,8 @@ class LocalGitTool(BaseTool):
         super().__init__()
         self.repo_path = repo_path
         self.logger = logging.getLogger(__name__)
+        # (コミットSHA, ハンク有無) -> 変更内容のJSON
+        self.commit_cache: Dict[Tuple[str, bool], str] = {}
         
         try:
             self.repo = Repo(repo_path)
@@ -30,8 +48,8 @@ class LocalGitTool(BaseTool):
             self.logger.error(f"Failed to initialize Git repository: {e}")
             self.repo = None
     
-    def _run(self, action: str, commit_hash: str = None, file_path: str = None) -> str:
-        """Git操作を実行"""
+    def _run(self, action: str, commit_hash: str = None, file_path: str = None, include_hunks: bool = False) -> str:
+        """Git操作を実行（include_hunksを指定するとget_commit_changesで差分のハンクも取得）"""
         if not self.repo:
             return json.dumps({"error": "Git repository not initialized"})
         
@@ -39,8 +57,7 @@ class LocalGitTool(BaseTool):
             if action == "get_commit_changes":
                 if not commit_hash:
                     return json.dumps({"error": "commit_hash required for get_commit_changes"})
-                changes = self._get_commit_changes(commit_hash)
-                return json.dumps(changes, ensure_ascii=False, indent=2)
+                return self._get_commit_changes_json(commit_hash, include_hunks)
             
             elif action == "get_file_content":
                 if not file_path:
@@ -50,11 +67,11 @@ class LocalGitTool(BaseTool):
             
             elif action == "list_c_files":
                 c_files = self._list_c_files()
-                return json.dumps(c_files, ensure_ascii=False, indent=2)
+                return orjson.dumps(c_files, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
             
             elif action == "get_recent_commits":
                 commits = self._get_recent_commits()
-                return json.dumps(commits, ensure_ascii=False, indent=2)
+                return orjson.dumps(commits, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
             
             else:
                 return json.dumps({"error": f"Unknown action: {action}"})
@@ -63,8 +80,26 @@ class LocalGitTool(BaseTool):
             self.logger.error(f"Git operation failed: {e}")
             return json.dumps({"error": str(e)})
     
-    def _get_commit_changes(self, commit_hash: str) -> Dict:
-        """指定コミットの変更内容を取得"""
+    def _get_commit_changes_json(self, commit_hash: str, include_hunks: bool = False) -> str:
+        """コミットの変更内容をJSONで取得（ブランチ名などはSHAに解決してからキャッシュを参照）"""
+        sha = self.repo.commit(commit_hash).hexsha
+        cache_key = (sha, include_hunks)
+        cached = self.commit_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        result = orjson.dumps(
+            self._get_commit_changes(sha, include_hunks),
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ).decode()
+        if len(self.commit_cache) >= COMMIT_CACHE_SIZE:
+            # 最も古いエントリを破棄
+            del self.commit_cache[next(iter(self.commit_cache))]
+        self.commit_cache[cache_key] = result
+        return result
+    
+    def _get_commit_changes(self, commit_hash: str, include_hunks: bool = False) -> Dict:
+        """指定コミットの変更内容を取得（ハンクが不要な場合は行数をgitの--numstatで集計）"""
         try:
             commit = self.repo.commit(commit_hash)
             
@@ -94,12 +129,18 @@ class LocalGitTool(BaseTool):
                 }
             }
             
-            # 親コミットとの差分を取得
+            # 親コミットから対象コミットへの差分を取得（ルートコミットは空のツリーとの差分）
+            # パッチ本文はハンクが必要な場合のみ生成し、それ以外は追加・削除行数だけをgitに集計させる
             parent = commit.parents[0] if commit.parents else None
-            diff = commit.diff(parent)
+            if parent:
+                diff = parent.diff(commit, create_patch=include_hunks)
+            else:
+                diff = commit.diff(NULL_TREE, create_patch=include_hunks)
+            line_stats = None if include_hunks else self._get_numstat(parent, commit)
             
             for item in diff:
                 file_path = item.a_path or item.b_path
+                change_type = self._change_type(item)
                 
                 # C言語ファイルのみを対象
                 if not self._is_c_file(file_path):
@@ -109,13 +150,13 @@ class LocalGitTool(BaseTool):
                 changes["stats"]["c_files_count"] += 1
                 
                 # 変更タイプ別の分類
-                if item.change_type == 'M':  # Modified
+                if change_type == 'M':  # Modified
                     changes["c_files"]["modified"].append(file_path)
-                elif item.change_type == 'A':  # Added
+                elif change_type == 'A':  # Added
                     changes["c_files"]["added"].append(file_path)
-                elif item.change_type == 'D':  # Deleted
+                elif change_type == 'D':  # Deleted
                     changes["c_files"]["deleted"].append(file_path)
-                elif item.change_type == 'R':  # Renamed
+                elif change_type == 'R':  # Renamed
                     changes["c_files"]["renamed"].append({
                         "old_path": item.a_path,
                         "new_path": item.b_path
@@ -123,31 +164,38 @@ class LocalGitTool(BaseTool):
                 
                 # ファイルごとの詳細な変更情報
                 file_change_info = {
-                    "change_type": item.change_type,
+                    "change_type": change_type,
                     "old_path": item.a_path,
                     "new_path": item.b_path,
                     "added_lines": 0,
-                    "removed_lines": 0,
-                    "diff_hunks": []
+                    "removed_lines": 0
                 }
                 
+                if line_stats is not None:
+                    # --numstatの集計結果を使用（ハンクの解析は行わない）
+                    added, removed = line_stats.get(item.b_path or item.a_path, (0, 0))
+                    file_change_info["added_lines"] = added
+                    file_change_info["removed_lines"] = removed
+                    changes["stats"]["total_additions"] += added
+                    changes["stats"]["total_deletions"] += removed
+                    changes["file_changes"][file_path] = file_change_info
+                    continue
+                
+                file_change_info["diff_hunks"] = []
+                
                 # 差分の詳細情報を取得
                 try:
                     if item.diff:
                         diff_text = item.diff.decode('utf-8')
                         file_change_info["diff_text"] = diff_text
                         
-                        # 追加・削除行数をカウント
-                        for line in diff_text.split('\n'):
-                            if line.startswith('+') and not line.startswith('+++'):
-                                file_change_info["added_lines"] += 1
-                                changes["stats"]["total_additions"] += 1
-                            elif line.startswith('-') and not line.startswith('---'):
-                                file_change_info["removed_lines"] += 1
-                                changes["stats"]["total_deletions"] += 1
-                        
-                        # ハンク情報を抽出
-                        file_change_info["diff_hunks"] = self._extract_diff_hunks(diff_text)
+                        # 追加・削除行数とハンク情報を1回の走査で取得
+                        added, removed, hunks = self._parse_diff(diff_text)
+                        file_change_info["added_lines"] = added
+                        file_change_info["removed_lines"] = removed
+                        file_change_info["diff_hunks"] = hunks
+                        changes["stats"]["total_additions"] += added
+                        changes["stats"]["total_deletions"] += removed
                 
                 except UnicodeDecodeError:
                     file_change_info["diff_text"] = "[Binary file or encoding error]"
@@ -161,6 +209,49 @@ class LocalGitTool(BaseTool):
         except Exception as e:
             raise ValueError(f"Failed to get commit changes: {str(e)}")
     
+    def _get_numstat(self, parent, commit) -> Dict[str, Tuple[int, int]]:
+        """git diff-tree --numstat でファイルごとの (追加行数, 削除行数) を取得"""
+        args = ['-r', '--numstat', '-z', '-M', '--no-commit-id']
+        if parent:
+            args += [parent.hexsha, commit.hexsha]
+        else:
+            args += ['--root', commit.hexsha]
+        
+        # -z 指定時は "追加\t削除\tパス" がNUL区切りで並ぶ（リネームはパス欄が空で、旧パス・新パスが続く）
+        fields = self.repo.git.diff_tree(*args).split('\0')
+        line_stats = {}
+        i = 0
+        while i < len(fields):
+            entry = fields[i]
+            i += 1
+            if not entry:
+                continue
+            
+            added, removed, path = entry.split('\t', 2)
+            if not path:
+                path = fields[i + 1]
+                i += 2
+            
+            # バイナリファイルは行数が "-" になる
+            line_stats[path] = (
+                int(added) if added != '-' else 0,
+                int(removed) if removed != '-' else 0
+            )
+        
+        return line_stats
+    
+    def _change_type(self, item) -> str:
+        """差分項目の変更タイプ（パッチ生成時はchange_typeが設定されないためフラグから判定）"""
+        if item.change_type:
+            return item.change_type
+        if item.new_file:
+            return 'A'
+        if item.deleted_file:
+            return 'D'
+        if item.renamed_file:
+            return 'R'
+        return 'M'
+    
     def _get_file_content(self, file_path: str, commit_hash: str = None) -> str:
         """指定ファイルの内容を取得"""
         try:
@@ -174,12 +265,13 @@ class LocalGitTool(BaseTool):
                     raise ValueError(f"File {file_path} not found in commit {commit_hash}")
             else:
                 # 現在のワーキングディレクトリのファイル内容
+                # 存在確認のstatを省き、開けなかった場合にエラーとする
                 full_path = Path(self.repo_path) / file_path
-                if not full_path.exists():
+                try:
+                    with open(full_path, 'r', encoding='utf-8') as f:
+                        return f.read()
+                except FileNotFoundError:
                     raise ValueError(f"File {file_path} not found in working directory")
-                
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    return f.read()
                     
         except UnicodeDecodeError:
             raise ValueError(f"File {file_path} is binary or has encoding issues")
@@ -187,36 +279,46 @@ class LocalGitTool(BaseTool):
     def _list_c_files(self) -> List[Dict]:
         """リポジトリ内のC言語ファイル一覧を取得"""
         c_files = []
+        repo_root = Path(self.repo_path)
         
         try:
-            # Git管理下のファイルのみを対象
-            for item in self.repo.index.entries:
-                file_path = item[0]
-                if self._is_c_file(file_path):
-                    full_path = Path(self.repo_path) / file_path
-                    
-                    file_info = {
-                        "path": file_path,
-                        "size": full_path.stat().st_size if full_path.exists() else 0,
-                        "modified_time": datetime.fromtimestamp(
-                            full_path.stat().st_mtime
-                        ).isoformat() if full_path.exists() else None
-                    }
-                    c_files.append(file_info)
+            # Git管理下のC言語ファイルのみをgit側で絞り込んで取得
+            output = self.repo.git.ls_files('-z', '--', *_C_FILE_PATHSPECS)
+            for file_path in output.split('\0'):
+                if not file_path:
+                    continue
+                
+                # 存在確認・サイズ・更新日時を1回のstatで取得
+                try:
+                    st = os.stat(repo_root / file_path)
+                except FileNotFoundError:
+                    st = None
+                
+                file_info = {
+                    "path": file_path,
+                    "size": st.st_size if st else 0,
+                    "modified_time": datetime.fromtimestamp(
+                        st.st_mtime
+                    ).isoformat() if st else None
+                }
+                c_files.append(file_info)
             
         except Exception as e:
             self.logger.warning(f"Failed to list files from index: {e}")
             # フォールバック: ファイルシステムから検索
-            repo_path = Path(self.repo_path)
             for pattern in ["**/*.c", "**/*.h"]:
-                for file_path in repo_path.glob(pattern):
-                    if file_path.is_file():
-                        relative_path = file_path.relative_to(repo_path)
+                for file_path in repo_root.glob(pattern):
+                    try:
+                        st = file_path.stat()
+                    except OSError:
+                        continue
+                    if stat.S_ISREG(st.st_mode):
+                        relative_path = file_path.relative_to(repo_root)
                         c_files.append({
                             "path": str(relative_path),
-                            "size": file_path.stat().st_size,
+                            "size": st.st_size,
                             "modified_time": datetime.fromtimestamp(
-                                file_path.stat().st_mtime
+                                st.st_mtime
                             ).isoformat()
                         })
         
@@ -248,8 +350,8 @@ class LocalGitTool(BaseTool):
         if not file_path:
             return False
         
-        c_extensions = ['.c', '.h', '.cc', '.cpp', '.cxx', '.hpp']
-        return any(file_path.lower().endswith(ext) for ext in c_extensions)
+        _, dot, ext = file_path.rpartition('.')
+        return bool(dot) and ext.lower() in _C_EXTS
     
     def _count_c_files_in_commit(self, commit) -> int:
         """コミット内のC言語ファイル数を数える"""
@@ -267,39 +369,49 @@ class LocalGitTool(BaseTool):
         except Exception:
             return 0
     
-    def _extract_diff_hunks(self, diff_text: str) -> List[Dict]:
-        """差分からハンク情報を抽出"""
+    def _parse_diff(self, diff_text: str) -> Tuple[int, int, List[Dict]]:
+        """差分を1回走査して (追加行数, 削除行数, ハンク情報) を取得"""
+        added = 0
+        removed = 0
+        # ハンクの変更行は列形式で保持（types: 各行の種別 "+"/"-"/" " を連結した文字列、contents: 各行の内容）
         hunks = []
-        current_hunk = None
+        types = None
+        contents = None
         
         for line in diff_text.split('\n'):
-            if line.startswith('@@'):
-                # 新しいハンクの開始
-                if current_hunk:
-                    hunks.append(current_hunk)
+            marker = line[:1]
+            if marker == '@':
+                # 新しいハンクの開始（ヘッダを解析できない場合は次のハンクまで読み飛ばす）
+                hunk_match = _HUNK_RE.match(line)
+                if not hunk_match:
+                    types = None
+                    continue
                 
-                # ハンク情報を解析
-                import re
-                hunk_match = re.match(r'@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@', line)
-                if hunk_match:
-                    current_hunk = {
-                        "old_start": int(hunk_match.group(1)),
-                        "old_count": int(hunk_match.group(2)) if hunk_match.group(2) else 1,
-                        "new_start": int(hunk_match.group(3)),
-                        "new_count": int(hunk_match.group(4)) if hunk_match.group(4) else 1,
-                        "context": line,
-                        "changes": []
-                    }
-            elif current_hunk and (line.startswith('+') or line.startswith('-') or line.startswith(' ')):
-                # 変更内容を記録
-                change_type = 'context' if line.startswith(' ') else ('addition' if line.startswith('+') else 'deletion')
-                current_hunk["changes"].append({
-                    "type": change_type,
-                    "content": line[1:]  # 先頭の+/-/ を除去
+                old_count, new_count = hunk_match.group(2), hunk_match.group(4)
+                types = []
+                contents = []
+                hunks.append({
+                    "old_start": int(hunk_match.group(1)),
+                    "old_count": int(old_count) if old_count else 1,
+                    "new_start": int(hunk_match.group(3)),
+                    "new_count": int(new_count) if new_count else 1,
+                    "context": line,
+                    "types": types,
+                    "contents": contents
                 })
+            elif types is None:
+                # ハンク外の行（ファイルヘッダなど）は集計しない
+                continue
+            elif marker == '+' or marker == '-' or marker == ' ':
+                if marker == '+':
+                    added += 1
+                elif marker == '-':
+                    removed += 1
+                types.append(marker)
+                contents.append(line[1:])
         
-        # 最後のハンクを追加
-        if current_hunk:
-            hunks.append(current_hunk)
+        # 行種別は1つの文字列にまとめる
+        for hunk in hunks:
+            hunk["types"] = ''.join(hunk["types"])
         
-        return hunks
\ No newline at end of file
+        return added, removed, hunks
\ No newline at end of file
@@ -3,14 +3,237 @@
 JSON、Markdown、HTML形式でのレビュー結果出力
 """
 
+import hashlib
 import json
 import logging
-from datetime import datetime
+import os
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Set, Tuple, Union
 
+import orjson
 from langchain.tools import BaseTool
-from ..reports.review_result import CReviewResult, CReviewIssue
+
+
+# list_reports の期間指定と対象日数の対応
+REPORT_PERIOD_DAYS = {
+    "last-week": 7,
+    "last-month": 30
+}
+
+# 重要度の表示順と見出し用の絵文字
+_SEVERITY_ORDER = ('critical', 'high', 'medium', 'low')
+_SEVERITY_EMOJI = {'critical': '🔴', 'high': '🟠', 'medium': '🟡', 'low': '🟢'}
+
+# JSONレポートのメタデータ（更新日時・サイズ・コミット）を記録するインデックスファイル
+REPORT_INDEX_FILENAME = ".index.jsonl"
+
+# コミットごとに直近のレビューデータのハッシュと生成済みファイルを記録するキャッシュファイル
+REPORT_CACHE_FILENAME = ".cache.json"
+
+# HTMLレポートのページ先頭（タイトルのみ可変）のテンプレート
+_HTML_HEAD_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>C Code Review Report - {commit_short}</title>
+"""
+
+# HTMLレポートのスタイル定義（固定の内容のため、あらかじめUTF-8にエンコードしておく）
+_HTML_STYLE = """    <style>
+        body { 
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
+            margin: 20px; 
+            background-color: #f5f5f5;
+        }
+        .container { max-width: 1200px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; }
+        .header { 
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+            color: white; 
+            padding: 20px; 
+            border-radius: 8px; 
+            margin-bottom: 20px; 
+        }
+        .stats { display: flex; gap: 20px; margin: 20px 0; flex-wrap: wrap; }
+        .stat-card { 
+            background: #fff; 
+            border: 1px solid #dee2e6; 
+            padding: 15px; 
+            border-radius: 8px; 
+            flex: 1; 
+            min-width: 200px;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        }
+        .issue { 
+            margin: 20px 0; 
+            padding: 15px; 
+            border-radius: 8px; 
+            background: #fff;
+            border-left: 4px solid;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        }
+        .issue-critical { border-left-color: #dc3545; }
+        .issue-high { border-left-color: #fd7e14; }
+        .issue-medium { border-left-color: #ffc107; }
+        .issue-low { border-left-color: #28a745; }
+        .code-block { 
+            background: #f8f9fa; 
+            padding: 10px; 
+            border-radius: 4px; 
+            font-family: 'Courier New', monospace; 
+            overflow-x: auto;
+            margin: 10px 0;
+        }
+        .file-path { color: #6c757d; font-family: monospace; }
+        .badge {
+            display: inline-block;
+            padding: 2px 8px;
+            border-radius: 12px;
+            font-size: 12px;
+            font-weight: bold;
+            text-transform: uppercase;
+        }
+        .badge-critical { background: #dc3545; color: white; }
+        .badge-high { background: #fd7e14; color: white; }
+        .badge-medium { background: #ffc107; color: black; }
+        .badge-low { background: #28a745; color: white; }
+        .nav { margin-bottom: 20px; }
+        .nav button {
+            background: #007bff;
+            color: white;
+            border: none;
+            padding: 8px 16px;
+            margin-right: 10px;
+            border-radius: 4px;
+            cursor: pointer;
+        }
+        .nav button:hover { background: #0056b3; }
+        .hidden { display: none; }
+        #issues-container.filtered .issue { display: none; }
+        #issues-container.filtered .issue.shown { display: block; }
+    </style>
+</head>
+<body>
+    <div class="container">
+""".encode('utf-8')
+
+# HTMLレポートのサマリー部分のテンプレート
+_HTML_SUMMARY_TEMPLATE = """        <div class="header">
+            <h1>🔍 C言語コードレビュー結果</h1>
+            <p><strong>コミット:</strong> <code>{commit_hash}</code></p>
+            <p><strong>実行時刻:</strong> {timestamp}</p>
+            <p><strong>対象ファイル:</strong> {file_count}ファイル</p>
+        </div>
+        
+        <div class="stats">
+            <div class="stat-card">
+                <h3>総合</h3>
+                <h2>{issue_count}</h2>
+                <p>検出問題数</p>
+            </div>
+            <div class="stat-card">
+                <h3>Critical</h3>
+                <h2 style="color: #dc3545;">{critical_count}</h2>
+                <p>緊急対応必要</p>
+            </div>
+            <div class="stat-card">
+                <h3>High</h3>
+                <h2 style="color: #fd7e14;">{high_count}</h2>
+                <p>高優先度</p>
+            </div>
+            <div class="stat-card">
+                <h3>対象ファイル</h3>
+                <h2>{file_count}</h2>
+                <p>C言語ファイル</p>
+            </div>
+        </div>
+        
+        <div class="nav">
+            <button onclick="showAll()">全て表示</button>
+            <button onclick="showSeverity('critical')">Critical</button>
+            <button onclick="showSeverity('high')">High</button>
+            <button onclick="showSeverity('medium')">Medium</button>
+            <button onclick="showSeverity('low')">Low</button>
+        </div>
+        
+        <div id="issues-container">
+"""
+
+# HTMLレポートの問題1件分のテンプレート
+_HTML_ISSUE_TEMPLATE = """
+            <div class="issue issue-{severity}" id="{issue_id}" data-severity="{severity}">
+                <div style="display: flex; justify-content: space-between; align-items: start;">
+                    <h3>{message}</h3>
+                    <span class="badge badge-{severity}">{severity}</span>
+                </div>
+                <p class="file-path">{location}</p>
+                {function_name}
+                {category}
+                {suggestion}
+                {code_snippet}
+                {fixed_code_example}
+            </div>
+            """
+
+# 問題の任意項目と、値がある場合に出力するHTML断片
+_HTML_OPTIONAL_FIELDS = (
+    ("function_name", '<p><strong>関数:</strong> <code>{}()</code></p>'),
+    ("category", '<p><strong>カテゴリ:</strong> {}</p>'),
+    ("suggestion", '<p><strong>改善提案:</strong> {}</p>'),
+    ("code_snippet", '<div class="code-block">{}</div>'),
+    ("fixed_code_example", '<h4>修正例:</h4><div class="code-block">{}</div>')
+)
+
+# HTMLに埋め込む値のエスケープ表（str.translateで1回の走査で置換する）
+_HTML_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#39;'
+})
+
+# HTMLレポートのページ末尾（表示切り替えスクリプト）。間に重要度ごとの要素IDの一覧（JSON）を挟んで出力する
+_HTML_FOOTER_START = """
+        </div>
+    </div>
+    
+    <script>
+        // 重要度 -> 問題要素のIDの一覧（生成時に作成）
+        const SEV_INDEX = """.encode('utf-8')
+_HTML_FOOTER_END = """;
+        let shownSeverity = null;
+        
+        function setShown(severity, shown) {
+            (SEV_INDEX[severity] || []).forEach(id => document.getElementById(id).classList.toggle('shown', shown));
+        }
+        
+        function showAll() {
+            // コンテナのクラスを外すだけで全件を再表示し、前回の絞り込み分のみ後始末する
+            document.getElementById('issues-container').classList.remove('filtered');
+            if (shownSeverity !== null) {
+                setShown(shownSeverity, false);
+                shownSeverity = null;
+            }
+        }
+        
+        function showSeverity(severity) {
+            // コンテナのクラスで全件を非表示にし、該当する重要度の要素のみを表示
+            if (shownSeverity !== null) {
+                setShown(shownSeverity, false);
+            }
+            setShown(severity, true);
+            shownSeverity = severity;
+            document.getElementById('issues-container').classList.add('filtered');
+        }
+    </script>
+</body>
+</html>""".encode('utf-8')
 
 
 class ReportGeneratorTool(BaseTool):
@@ -25,7 +248,8 @@ class ReportGeneratorTool(BaseTool):
         self.output_dir.mkdir(exist_ok=True)
         self.logger = logging.getLogger(__name__)
     
-    def _run(self, action: str, review_data: str = None, format_type: str = "all", commit_hash: str = None) -> str:
+    def _run(self, action: str, review_data: str = None, format_type: str = "all", commit_hash: str = None,
+             limit: int = None, period: str = "all") -> str:
         """レポート生成を実行"""
         try:
             if action == "generate_report":
@@ -34,20 +258,20 @@ class ReportGeneratorTool(BaseTool):
                 
                 # JSON文字列をパース
                 if isinstance(review_data, str):
-                    data = json.loads(review_data)
+                    data = orjson.loads(review_data)
                 else:
                     data = review_data
                 
                 result = self._generate_report(data, format_type, commit_hash)
-                return json.dumps(result, ensure_ascii=False, indent=2)
+                return orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
             
             elif action == "list_reports":
-                reports = self._list_reports()
-                return json.dumps(reports, ensure_ascii=False, indent=2)
+                reports = self._list_reports(limit=limit, period=period)
+                return orjson.dumps(reports, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
             
             elif action == "get_report_stats":
                 stats = self._get_report_stats()
-                return json.dumps(stats, ensure_ascii=False, indent=2)
+                return orjson.dumps(stats, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
             
             else:
                 return json.dumps({"error": f"Unknown action: {action}"})
@@ -58,26 +282,56 @@ class ReportGeneratorTool(BaseTool):
     
     def _generate_report(self, review_data: Dict, format_type: str, commit_hash: str) -> Dict[str, str]:
         """レビューレポートを生成"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 生成時刻は1回だけ取得し、ファイル名とJSONのメタデータで共有
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         commit_short = commit_hash[:8] if commit_hash else "unknown"
         
-        generated_files = {}
-        
-        if format_type in ["all", "json"]:
-            json_file = self._generate_json_report(review_data, timestamp, commit_short)
-            generated_files["json"] = json_file
-        
-        if format_type in ["all", "markdown"]:
-            md_file = self._generate_markdown_report(review_data, timestamp, commit_short)
-            generated_files["markdown"] = md_file
-        
-        if format_type in ["all", "html"]:
-            html_file = self._generate_html_report(review_data, timestamp, commit_short)
-            generated_files["html"] = html_file
-        
-        if format_type in ["all", "summary"]:
-            summary_file = self._generate_summary_report(review_data, timestamp, commit_short)
-            generated_files["summary"] = summary_file
+        # 同じコミットに対して同一内容・同一形式のレポートを生成済みであれば再利用
+        cache_key = commit_hash or "unknown"
+        content_hash = hashlib.blake2b(
+            orjson.dumps(review_data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS) + format_type.encode('utf-8')
+        ).hexdigest()
+        report_cache = self._read_report_cache()
+        cached = report_cache.get(cache_key)
+        if (cached and cached.get("content_hash") == content_hash
+                and all(Path(path).exists() for path in cached["generated_files"].values())):
+            return {
+                "status": "success",
+                "generated_files": cached["generated_files"],
+                "timestamp": cached["timestamp"],
+                "commit_hash": commit_hash
+            }
+        
+        # 各形式で共通の集計は1回の走査で済ませて各生成処理に渡す
+        issue_stats = self._summarize_issues(review_data.get("issues", []))
+        
+        # 各形式は共有状態を持たないため、組み立てと書き出しをスレッドで並行に実行
+        builders = [
+            ("json", partial(self._build_json_report, generated_at=now.isoformat())),
+            ("markdown", self._build_markdown_report),
+            ("html", self._build_html_report),
+            ("summary", self._build_summary_report)
+        ]
+        selected = [(fmt, build) for fmt, build in builders if format_type in ["all", fmt]]
+        
+        with ThreadPoolExecutor(max_workers=max(len(selected), 1)) as executor:
+            futures = [
+                (fmt, executor.submit(self._build_and_write_report, build, review_data, timestamp, commit_short, issue_stats))
+                for fmt, build in selected
+            ]
+            generated_files = {fmt: future.result() for fmt, future in futures}
+        
+        if "json" in generated_files:
+            # 一覧取得時にJSONを読み直さずに済むようインデックスへ追記
+            self._append_report_index(Path(generated_files["json"]), review_data.get("commit_hash", "unknown"))
+        
+        report_cache[cache_key] = {
+            "content_hash": content_hash,
+            "generated_files": generated_files,
+            "timestamp": timestamp
+        }
+        self._write_report_cache(report_cache)
         
         return {
             "status": "success",
@@ -86,15 +340,16 @@ class ReportGeneratorTool(BaseTool):
             "commit_hash": commit_hash
         }
     
-    def _generate_json_report(self, review_data: Dict, timestamp: str, commit_short: str) -> str:
-        """JSON形式のレポートを生成"""
+    def _build_json_report(self, review_data: Dict, timestamp: str, commit_short: str,
+                           issue_stats: Dict[str, Any], generated_at: str) -> Tuple[Path, bytes]:
+        """JSON形式のレポートの出力先と内容を生成"""
         filename = f"c_review_{commit_short}_{timestamp}.json"
         filepath = self.output_dir / filename
         
         # レビューデータを構造化
         structured_data = {
             "metadata": {
-                "generated_at": datetime.now().isoformat(),
+                "generated_at": generated_at,
                 "commit_hash": review_data.get("commit_hash", "unknown"),
                 "tool_version": "1.0.0",
                 "format_version": "1.0"
@@ -102,27 +357,26 @@ class ReportGeneratorTool(BaseTool):
             "summary": {
                 "total_files": len(review_data.get("reviewed_files", [])),
                 "total_issues": len(review_data.get("issues", [])),
-                "severity_breakdown": self._calculate_severity_breakdown(review_data.get("issues", [])),
-                "category_breakdown": self._calculate_category_breakdown(review_data.get("issues", []))
+                "severity_breakdown": self._calculate_severity_breakdown(issue_stats),
+                "category_breakdown": dict(issue_stats["category_counts"])
             },
             "review_data": review_data
         }
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(structured_data, f, ensure_ascii=False, indent=2)
-        
-        return str(filepath)
+        return filepath, orjson.dumps(structured_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
     
-    def _generate_markdown_report(self, review_data: Dict, timestamp: str, commit_short: str) -> str:
-        """Markdown形式のレポートを生成"""
+    def _build_markdown_report(self, review_data: Dict, timestamp: str, commit_short: str,
+                               issue_stats: Dict[str, Any]) -> Tuple[Path, str]:
+        """Markdown形式のレポートの出力先と内容を生成"""
         filename = f"c_review_{commit_short}_{timestamp}.md"
         filepath = self.output_dir / filename
         
         issues = review_data.get("issues", [])
         reviewed_files = review_data.get("reviewed_files", [])
         commit_hash = review_data.get("commit_hash", "unknown")
+        issues_by_severity = issue_stats["issues_by_severity"]
         
-        markdown_content = f"""# C言語コードレビュー結果
+        parts = [f"""# C言語コードレビュー結果
 
 **コミット**: `{commit_hash}`  
 **レビュー実行時刻**: {timestamp}  
@@ -133,249 +387,136 @@ class ReportGeneratorTool(BaseTool):
 
 | 重要度 | 件数 |
 |--------|------|
-| 🔴 Critical | {len([i for i in issues if i.get('severity') == 'critical'])} |
-| 🟠 High | {len([i for i in issues if i.get('severity') == 'high'])} |
-| 🟡 Medium | {len([i for i in issues if i.get('severity') == 'medium'])} |
-| 🟢 Low | {len([i for i in issues if i.get('severity') == 'low'])} |
+| 🔴 Critical | {len(issues_by_severity['critical'])} |
+| 🟠 High | {len(issues_by_severity['high'])} |
+| 🟡 Medium | {len(issues_by_severity['medium'])} |
+| 🟢 Low | {len(issues_by_severity['low'])} |
 
 ## 📁 レビュー対象ファイル
 
-"""
+"""]
         
+        file_issue_counts = issue_stats["file_issue_counts"]
         for file_path in reviewed_files:
-            file_issues = [i for i in issues if i.get('file_path') == file_path]
-            markdown_content += f"- `{file_path}` ({len(file_issues)}件の問題)\n"
+            parts.append(f"- `{file_path}` ({file_issue_counts[file_path]}件の問題)\n")
         
         # 重要度別に問題を表示
-        for severity in ['critical', 'high', 'medium', 'low']:
-            severity_issues = [i for i in issues if i.get('severity') == severity]
+        for severity in _SEVERITY_ORDER:
+            severity_issues = issues_by_severity[severity]
             if severity_issues:
-                severity_emoji = {'critical': '🔴', 'high': '🟠', 'medium': '🟡', 'low': '🟢'}
-                markdown_content += f"\n## {severity_emoji[severity]} {severity.upper()} Issues\n\n"
+                parts.append(f"\n## {_SEVERITY_EMOJI[severity]} {severity.upper()} Issues\n\n")
                 
                 for idx, issue in enumerate(severity_issues, 1):
-                    markdown_content += f"### {idx}. {issue.get('message', 'Unknown issue')}\n\n"
-                    markdown_content += f"**ファイル**: `{issue.get('file_path', 'unknown')}`  \n"
+                    # 各項目は1回だけ取得して条件判定と出力に使う
+                    line_number = issue.get('line_number')
+                    function_name = issue.get('function_name')
+                    category = issue.get('category')
+                    suggestion = issue.get('suggestion')
+                    code_snippet = issue.get('code_snippet')
+                    fixed_code_example = issue.get('fixed_code_example')
+                    
+                    parts.append(f"### {idx}. {issue.get('message', 'Unknown issue')}\n\n")
+                    parts.append(f"**ファイル**: `{issue.get('file_path', 'unknown')}`  \n")
                     
-                    if issue.get('line_number'):
-                        markdown_content += f"**行番号**: {issue.get('line_number')}  \n"
+                    if line_number:
+                        parts.append(f"**行番号**: {line_number}  \n")
                     
-                    if issue.get('function_name'):
-                        markdown_content += f"**関数**: `{issue.get('function_name')}()`  \n"
+                    if function_name:
+                        parts.append(f"**関数**: `{function_name}()`  \n")
                     
-                    if issue.get('category'):
-                        markdown_content += f"**カテゴリ**: {issue.get('category')}  \n"
+                    if category:
+                        parts.append(f"**カテゴリ**: {category}  \n")
                     
-                    if issue.get('suggestion'):
-                        markdown_content += f"\n**改善提案**: {issue.get('suggestion')}\n\n"
+                    if suggestion:
+                        parts.append(f"\n**改善提案**: {suggestion}\n\n")
                     
-                    if issue.get('code_snippet'):
-                        markdown_content += f"**問題のあるコード**:\n```c\n{issue.get('code_snippet')}\n```\n\n"
+                    if code_snippet:
+                        parts.append(f"**問題のあるコード**:\n```c\n{code_snippet}\n```\n\n")
                     
-                    if issue.get('fixed_code_example'):
-                        markdown_content += f"**修正例**:\n```c\n{issue.get('fixed_code_example')}\n```\n\n"
+                    if fixed_code_example:
+                        parts.append(f"**修正例**:\n```c\n{fixed_code_example}\n```\n\n")
                     
-                    markdown_content += "---\n\n"
+                    parts.append("---\n\n")
         
         # 推奨事項
         if review_data.get('recommendations'):
-            markdown_content += "\n## 💡 推奨事項\n\n"
+            parts.append("\n## 💡 推奨事項\n\n")
             for rec in review_data['recommendations']:
-                markdown_content += f"- {rec}\n"
+                parts.append(f"- {rec}\n")
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
-        
-        return str(filepath)
+        return filepath, "".join(parts)
     
-    def _generate_html_report(self, review_data: Dict, timestamp: str, commit_short: str) -> str:
-        """HTML形式のレポートを生成"""
+    def _build_html_report(self, review_data: Dict, timestamp: str, commit_short: str,
+                           issue_stats: Dict[str, Any]) -> Tuple[Path, bytes]:
+        """HTML形式のレポートの出力先と内容を生成"""
         filename = f"c_review_{commit_short}_{timestamp}.html"
         filepath = self.output_dir / filename
         
         issues = review_data.get("issues", [])
         reviewed_files = review_data.get("reviewed_files", [])
         commit_hash = review_data.get("commit_hash", "unknown")
-        
-        html_content = f"""<!DOCTYPE html>
-<html lang="ja">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>C Code Review Report - {commit_short}</title>
-    <style>
-        body {{ 
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-            margin: 20px; 
-            background-color: #f5f5f5;
-        }}
-        .container {{ max-width: 1200px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; }}
-        .header {{ 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-            color: white; 
-            padding: 20px; 
-            border-radius: 8px; 
-            margin-bottom: 20px; 
-        }}
-        .stats {{ display: flex; gap: 20px; margin: 20px 0; flex-wrap: wrap; }}
-        .stat-card {{ 
-            background: #fff; 
-            border: 1px solid #dee2e6; 
-            padding: 15px; 
-            border-radius: 8px; 
-            flex: 1; 
-            min-width: 200px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .issue {{ 
-            margin: 20px 0; 
-            padding: 15px; 
-            border-radius: 8px; 
-            background: #fff;
-            border-left: 4px solid;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .issue-critical {{ border-left-color: #dc3545; }}
-        .issue-high {{ border-left-color: #fd7e14; }}
-        .issue-medium {{ border-left-color: #ffc107; }}
-        .issue-low {{ border-left-color: #28a745; }}
-        .code-block {{ 
-            background: #f8f9fa; 
-            padding: 10px; 
-            border-radius: 4px; 
-            font-family: 'Courier New', monospace; 
-            overflow-x: auto;
-            margin: 10px 0;
-        }}
-        .file-path {{ color: #6c757d; font-family: monospace; }}
-        .badge {{
-            display: inline-block;
-            padding: 2px 8px;
-            border-radius: 12px;
-            font-size: 12px;
-            font-weight: bold;
-            text-transform: uppercase;
-        }}
-        .badge-critical {{ background: #dc3545; color: white; }}
-        .badge-high {{ background: #fd7e14; color: white; }}
-        .badge-medium {{ background: #ffc107; color: black; }}
-        .badge-low {{ background: #28a745; color: white; }}
-        .nav {{ margin-bottom: 20px; }}
-        .nav button {{
-            background: #007bff;
-            color: white;
-            border: none;
-            padding: 8px 16px;
-            margin-right: 10px;
-            border-radius: 4px;
-            cursor: pointer;
-        }}
-        .nav button:hover {{ background: #0056b3; }}
-        .hidden {{ display: none; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🔍 C言語コードレビュー結果</h1>
-            <p><strong>コミット:</strong> <code>{commit_hash}</code></p>
-            <p><strong>実行時刻:</strong> {timestamp}</p>
-            <p><strong>対象ファイル:</strong> {len(reviewed_files)}ファイル</p>
-        </div>
-        
-        <div class="stats">
-            <div class="stat-card">
-                <h3>総合</h3>
-                <h2>{len(issues)}</h2>
-                <p>検出問題数</p>
-            </div>
-            <div class="stat-card">
-                <h3>Critical</h3>
-                <h2 style="color: #dc3545;">{len([i for i in issues if i.get('severity') == 'critical'])}</h2>
-                <p>緊急対応必要</p>
-            </div>
-            <div class="stat-card">
-                <h3>High</h3>
-                <h2 style="color: #fd7e14;">{len([i for i in issues if i.get('severity') == 'high'])}</h2>
-                <p>高優先度</p>
-            </div>
-            <div class="stat-card">
-                <h3>対象ファイル</h3>
-                <h2>{len(reviewed_files)}</h2>
-                <p>C言語ファイル</p>
-            </div>
-        </div>
-        
-        <div class="nav">
-            <button onclick="showAll()">全て表示</button>
-            <button onclick="showSeverity('critical')">Critical</button>
-            <button onclick="showSeverity('high')">High</button>
-            <button onclick="showSeverity('medium')">Medium</button>
-            <button onclick="showSeverity('low')">Low</button>
-        </div>
-        
-        <div id="issues-container">
-"""
-        
-        # 問題の詳細をHTML形式で追加
+        issues_by_severity = issue_stats["issues_by_severity"]
+        
+        # 固定部分はエンコード済みのバイト列をそのまま使い、可変部分のみを組み立てる
+        head = _HTML_HEAD_TEMPLATE.format(commit_short=commit_short.translate(_HTML_ESCAPE_TABLE))
+        parts = [_HTML_SUMMARY_TEMPLATE.format(
+            commit_hash=str(commit_hash).translate(_HTML_ESCAPE_TABLE),
+            timestamp=timestamp.translate(_HTML_ESCAPE_TABLE),
+            file_count=len(reviewed_files),
+            issue_count=len(issues),
+            critical_count=len(issues_by_severity['critical']),
+            high_count=len(issues_by_severity['high'])
+        )]
+        
+        # 問題の詳細をHTML形式で追加し、重要度ごとの要素IDを記録
+        severity_index = {}
         for idx, issue in enumerate(issues):
-            severity = issue.get('severity', 'unknown')
-            css_class = f"issue-{severity}"
+            severity = str(issue.get('severity', 'unknown')).translate(_HTML_ESCAPE_TABLE)
+            issue_id = f"issue-{idx}"
+            severity_index.setdefault(severity, []).append(issue_id)
             
-            html_content += f"""
-            <div class="issue {css_class}" data-severity="{severity}">
-                <div style="display: flex; justify-content: space-between; align-items: start;">
-                    <h3>{issue.get('message', 'Unknown issue')}</h3>
-                    <span class="badge badge-{severity}">{severity}</span>
-                </div>
-                <p class="file-path">{issue.get('file_path', 'unknown')}{':' + str(issue.get('line_number', '')) if issue.get('line_number') else ''}</p>
-                {f'<p><strong>関数:</strong> <code>{issue.get("function_name")}()</code></p>' if issue.get('function_name') else ''}
-                {f'<p><strong>カテゴリ:</strong> {issue.get("category")}</p>' if issue.get('category') else ''}
-                {f'<p><strong>改善提案:</strong> {issue.get("suggestion")}</p>' if issue.get('suggestion') else ''}
-                {f'<div class="code-block">{issue.get("code_snippet")}</div>' if issue.get('code_snippet') else ''}
-                {f'<h4>修正例:</h4><div class="code-block">{issue.get("fixed_code_example")}</div>' if issue.get('fixed_code_example') else ''}
-            </div>
-            """
-        
-        html_content += """
-        </div>
-    </div>
-    
-    <script>
-        function showAll() {
-            const issues = document.querySelectorAll('.issue');
-            issues.forEach(issue => issue.style.display = 'block');
-        }
-        
-        function showSeverity(severity) {
-            const issues = document.querySelectorAll('.issue');
-            issues.forEach(issue => {
-                if (issue.dataset.severity === severity) {
-                    issue.style.display = 'block';
-                } else {
-                    issue.style.display = 'none';
-                }
-            });
-        }
-    </script>
-</body>
-</html>"""
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        return str(filepath)
+            location = str(issue.get('file_path', 'unknown'))
+            line_number = issue.get('line_number')
+            if line_number:
+                location += f":{line_number}"
+            
+            # 任意項目は1回だけ取得し、値がある場合のみHTML断片を出力
+            fields = {}
+            for key, template in _HTML_OPTIONAL_FIELDS:
+                value = issue.get(key)
+                fields[key] = template.format(str(value).translate(_HTML_ESCAPE_TABLE)) if value else ''
+            parts.append(_HTML_ISSUE_TEMPLATE.format(
+                severity=severity,
+                issue_id=issue_id,
+                message=str(issue.get('message', 'Unknown issue')).translate(_HTML_ESCAPE_TABLE),
+                location=location.translate(_HTML_ESCAPE_TABLE),
+                **fields
+            ))
+        
+        # </script> で閉じられないよう "</" をエスケープして埋め込む
+        severity_index_json = orjson.dumps(severity_index, option=orjson.OPT_NON_STR_KEYS).replace(b'</', b'<\\/')
+        
+        return filepath, b"".join((
+            head.encode('utf-8'),
+            _HTML_STYLE,
+            "".join(parts).encode('utf-8'),
+            _HTML_FOOTER_START,
+            severity_index_json,
+            _HTML_FOOTER_END
+        ))
     
-    def _generate_summary_report(self, review_data: Dict, timestamp: str, commit_short: str) -> str:
-        """サマリーレポートを生成"""
+    def _build_summary_report(self, review_data: Dict, timestamp: str, commit_short: str,
+                              issue_stats: Dict[str, Any]) -> Tuple[Path, str]:
+        """サマリーレポートの出力先と内容を生成"""
         filename = f"c_review_summary_{commit_short}_{timestamp}.txt"
         filepath = self.output_dir / filename
         
         issues = review_data.get("issues", [])
         reviewed_files = review_data.get("reviewed_files", [])
         commit_hash = review_data.get("commit_hash", "unknown")
+        issues_by_severity = issue_stats["issues_by_severity"]
         
-        summary = f"""
+        parts = [f"""
 ====================================
 C言語コードレビュー結果サマリー
 ====================================
@@ -386,86 +527,225 @@ C言語コードレビュー結果サマリー
 検出問題数: {len(issues)}件
 
 問題件数（重要度別）:
-  🔴 Critical: {len([i for i in issues if i.get('severity') == 'critical'])}件
-  🟠 High:     {len([i for i in issues if i.get('severity') == 'high'])}件
-  🟡 Medium:   {len([i for i in issues if i.get('severity') == 'medium'])}件
-  🟢 Low:      {len([i for i in issues if i.get('severity') == 'low'])}件
+  🔴 Critical: {len(issues_by_severity['critical'])}件
+  🟠 High:     {len(issues_by_severity['high'])}件
+  🟡 Medium:   {len(issues_by_severity['medium'])}件
+  🟢 Low:      {len(issues_by_severity['low'])}件
 
 対象ファイル一覧:
-"""
+"""]
         
+        file_issue_counts = issue_stats["file_issue_counts"]
         for file_path in reviewed_files:
-            file_issues = [i for i in issues if i.get('file_path') == file_path]
-            summary += f"  - {file_path} ({len(file_issues)}件)\n"
+            parts.append(f"  - {file_path} ({file_issue_counts[file_path]}件)\n")
         
         # Critical問題があれば詳細表示
-        critical_issues = [i for i in issues if i.get('severity') == 'critical']
+        critical_issues = issues_by_severity['critical']
         if critical_issues:
-            summary += f"\n緊急対応が必要な問題:\n"
+            parts.append(f"\n緊急対応が必要な問題:\n")
             for issue in critical_issues:
-                summary += f"  - {issue.get('file_path', 'unknown')}:{issue.get('line_number', '?')} - {issue.get('message', 'Unknown')}\n"
+                parts.append(f"  - {issue.get('file_path', 'unknown')}:{issue.get('line_number', '?')} - {issue.get('message', 'Unknown')}\n")
         else:
-            summary += f"\n緊急対応が必要な問題: なし\n"
+            parts.append(f"\n緊急対応が必要な問題: なし\n")
         
-        summary += f"\n詳細レポート:\n"
-        summary += f"  - JSON: {self.output_dir}/c_review_{commit_short}_{timestamp}.json\n"
-        summary += f"  - Markdown: {self.output_dir}/c_review_{commit_short}_{timestamp}.md\n"
-        summary += f"  - HTML: {self.output_dir}/c_review_{commit_short}_{timestamp}.html\n"
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(summary)
+        parts.append(f"\n詳細レポート:\n")
+        parts.append(f"  - JSON: {self.output_dir}/c_review_{commit_short}_{timestamp}.json\n")
+        parts.append(f"  - Markdown: {self.output_dir}/c_review_{commit_short}_{timestamp}.md\n")
+        parts.append(f"  - HTML: {self.output_dir}/c_review_{commit_short}_{timestamp}.html\n")
         
+        return filepath, "".join(parts)
+    
+    def _build_and_write_report(self, build: Callable[..., Tuple[Path, Union[str, bytes]]], review_data: Dict,
+                                timestamp: str, commit_short: str, issue_stats: Dict[str, Any]) -> str:
+        """1形式分のレポートを組み立てて書き出し、出力先のパスを返す"""
+        filepath, content = build(review_data, timestamp, commit_short, issue_stats)
+        self._write_report(filepath, content)
         return str(filepath)
     
-    def _calculate_severity_breakdown(self, issues: List[Dict]) -> Dict[str, int]:
-        """重要度別の問題数を計算"""
-        breakdown = {"critical": 0, "high": 0, "medium": 0, "low": 0}
+    def _write_report(self, filepath: Path, content: Union[str, bytes]) -> None:
+        """組み立て済みのレポートをUTF-8で一括エンコードし、1回のwriteで書き出す"""
+        data = memoryview(content.encode('utf-8') if isinstance(content, str) else content)
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            # 通常は1回で書き終わるが、部分書き込みの場合は残りを書き出す
+            while data:
+                written = os.write(fd, data)
+                data = data[written:]
+        finally:
+            os.close(fd)
+    
+    def _summarize_issues(self, issues: List[Dict]) -> Dict[str, Any]:
+        """問題一覧を1回走査して重要度別に振り分け、カテゴリ別・ファイル別の件数を集計"""
+        issues_by_severity = {severity: [] for severity in _SEVERITY_ORDER}
+        category_counts = Counter()
+        file_issue_counts = Counter()
         
         for issue in issues:
-            severity = issue.get('severity', 'low')
-            if severity in breakdown:
-                breakdown[severity] += 1
+            issues_by_severity.setdefault(issue.get('severity', 'low'), []).append(issue)
+            category_counts[issue.get('category', 'other')] += 1
+            file_issue_counts[issue.get('file_path')] += 1
         
-        return breakdown
+        return {
+            "issues_by_severity": issues_by_severity,
+            "category_counts": category_counts,
+            "file_issue_counts": file_issue_counts
+        }
+    
+    def _calculate_severity_breakdown(self, issue_stats: Dict[str, Any]) -> Dict[str, int]:
+        """重要度別の問題数を計算"""
+        issues_by_severity = issue_stats["issues_by_severity"]
+        return {severity: len(issues_by_severity[severity]) for severity in _SEVERITY_ORDER}
     
-    def _calculate_category_breakdown(self, issues: List[Dict]) -> Dict[str, int]:
-        """カテゴリ別の問題数を計算"""
-        breakdown = {}
+    def _list_reports(self, limit: int = None, period: str = "all") -> List[Dict]:
+        """生成されたレポートの一覧を取得（新しい順、期間・件数で絞り込み）"""
+        report_files = self._scan_report_files()
+        existing = {report_file.name for report_file, _ in report_files}
         
-        for issue in issues:
-            category = issue.get('category', 'other')
-            breakdown[category] = breakdown.get(category, 0) + 1
+        cutoff_days = REPORT_PERIOD_DAYS.get(period)
+        if cutoff_days is not None:
+            cutoff = (datetime.now() - timedelta(days=cutoff_days)).timestamp()
+            report_files = [(f, st) for f, st in report_files if st.st_mtime >= cutoff]
         
-        return breakdown
+        report_files.sort(key=lambda item: item[1].st_mtime, reverse=True)
+        if limit is not None:
+            report_files = report_files[:limit]
+        
+        return self._describe_reports(report_files, existing)
+    
+    def _scan_report_files(self) -> List[Tuple[Path, os.stat_result]]:
+        """JSONレポートのファイルとstat結果を列挙"""
+        # ディレクトリは1回の走査で列挙し、対象ファイルのみstatを取得
+        with os.scandir(self.output_dir) as entries:
+            return [
+                (Path(entry.path), entry.stat())
+                for entry in entries
+                if entry.name.startswith("c_review_") and entry.name.endswith(".json") and entry.is_file()
+            ]
     
-    def _list_reports(self) -> List[Dict]:
-        """生成されたレポートの一覧を取得"""
+    def _describe_reports(self, report_files: List[Tuple[Path, os.stat_result]], existing: Set[str]) -> List[Dict]:
+        """レポートファイルの一覧情報を作成（existingは出力先に現存する全レポートのファイル名）"""
+        # コミットハッシュはインデックスから取得し、JSONの読み込みは
+        # インデックスにない・更新されたファイルのみに限定
+        index = self._read_report_index()
+        index_changed = False
         reports = []
-        
-        for report_file in self.output_dir.glob("c_review_*.json"):
-            try:
-                with open(report_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+        for report_file, st in report_files:
+            entry = index.get(report_file.name)
+            if entry is None or entry.get("mtime_ns") != st.st_mtime_ns or entry.get("size") != st.st_size:
+                try:
+                    with open(report_file, 'rb') as f:
+                        data = orjson.loads(f.read())
+                except Exception as e:
+                    self.logger.warning(f"Failed to read report {report_file}: {e}")
+                    continue
                 
-                reports.append({
-                    "filename": report_file.name,
-                    "path": str(report_file),
-                    "created": datetime.fromtimestamp(report_file.stat().st_mtime).isoformat(),
-                    "size": report_file.stat().st_size,
-                    "commit_hash": data.get("review_data", {}).get("commit_hash", "unknown")
-                })
-            except Exception as e:
-                self.logger.warning(f"Failed to read report {report_file}: {e}")
-        
-        return sorted(reports, key=lambda x: x["created"], reverse=True)
+                entry = self._report_index_entry(report_file.name, st, data.get("review_data", {}).get("commit_hash", "unknown"))
+                index[report_file.name] = entry
+                index_changed = True
+            
+            reports.append({
+                "filename": report_file.name,
+                "path": str(report_file),
+                "created": datetime.fromtimestamp(st.st_mtime).isoformat(),
+                "size": st.st_size,
+                "commit_hash": entry["commit_hash"]
+            })
+        
+        # 削除されたレポートのエントリを除いてインデックスを書き直す
+        stale = index.keys() - existing
+        if index_changed or stale:
+            for name in stale:
+                del index[name]
+            self._write_report_index(index)
+        
+        return reports
+    
+    def _report_index_entry(self, filename: str, st: os.stat_result, commit_hash: str) -> Dict:
+        """インデックスに記録するレポートのメタデータ"""
+        return {
+            "filename": filename,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "commit_hash": commit_hash
+        }
+    
+    def _read_report_index(self) -> Dict[str, Dict]:
+        """インデックスを読み込み（ファイル名 -> メタデータ、壊れた行は無視）"""
+        index = {}
+        try:
+            with open(self.output_dir / REPORT_INDEX_FILENAME, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = orjson.loads(line)
+                        index[entry["filename"]] = entry
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        return index
+    
+    def _append_report_index(self, report_file: Path, commit_hash: str) -> None:
+        """生成したJSONレポートのメタデータをインデックスへ追記（失敗してもレポート生成は継続）"""
+        try:
+            entry = self._report_index_entry(report_file.name, os.stat(report_file), commit_hash)
+            with open(self.output_dir / REPORT_INDEX_FILENAME, 'ab') as f:
+                f.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+        except OSError as e:
+            self.logger.warning(f"Failed to update report index: {e}")
+    
+    def _write_report_index(self, index: Dict[str, Dict]) -> None:
+        """インデックスを書き直し（失敗しても一覧取得自体は継続）"""
+        try:
+            self._replace_file(
+                self.output_dir / REPORT_INDEX_FILENAME,
+                b"".join(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE) for entry in index.values())
+            )
+        except OSError as e:
+            self.logger.warning(f"Failed to write report index: {e}")
+    
+    def _read_report_cache(self) -> Dict[str, Dict]:
+        """生成済みレポートのキャッシュを読み込み（存在しない・壊れている場合は空）"""
+        try:
+            with open(self.output_dir / REPORT_CACHE_FILENAME, 'rb') as f:
+                report_cache = orjson.loads(f.read())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable report cache: {e}")
+            return {}
+        return report_cache if isinstance(report_cache, dict) else {}
+    
+    def _write_report_cache(self, report_cache: Dict[str, Dict]) -> None:
+        """生成済みレポートのキャッシュを書き込み（失敗してもレポート生成は継続）"""
+        try:
+            self._replace_file(self.output_dir / REPORT_CACHE_FILENAME, orjson.dumps(report_cache))
+        except OSError as e:
+            self.logger.warning(f"Failed to write report cache: {e}")
+    
+    def _replace_file(self, target: Path, content: bytes) -> None:
+        """一時ファイルに書き込んでから置き換え（読み手が書きかけの内容を見ないようにする）"""
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, target)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
     
     def _get_report_stats(self) -> Dict:
-        """レポートの統計情報を取得"""
-        reports = self._list_reports()
+        """レポートの統計情報を取得（件数・合計サイズはstatのみで集計し、詳細は最新の1件のみ作成）"""
+        report_files = self._scan_report_files()
+        
+        latest_report = None
+        if report_files:
+            latest = max(report_files, key=lambda item: item[1].st_mtime)
+            described = self._describe_reports([latest], {report_file.name for report_file, _ in report_files})
+            latest_report = described[0] if described else None
         
         return {
-            "total_reports": len(reports),
-            "latest_report": reports[0] if reports else None,
-            "total_size_mb": sum(r["size"] for r in reports) / (1024 * 1024),
+            "total_reports": len(report_files),
+            "latest_report": latest_report,
+            "total_size_mb": sum(st.st_size for _, st in report_files) / (1024 * 1024),
             "output_directory": str(self.output_dir)
         }
\ No newline at end of file
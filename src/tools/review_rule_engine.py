@@ -3,14 +3,154 @@
 設定されたコーディング規約に基づいてコードを評価
 """
 
+import fnmatch
+import hashlib
 import json
 import logging
-from typing import Dict, List, Any, Optional
+import os
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import Callable, Dict, List, Any, Optional, Pattern, Tuple
 
+import orjson
 from langchain.tools import BaseTool
 from ..config.config_manager import ConfigManager
 
 
+# evaluate_file の結果（シリアライズ済みJSON）をキャッシュする件数
+EVAL_CACHE_SIZE = 256
+
+# 拡張子のみを指定するパターン（*.c など）。末尾一致で判定できる
+_EXTENSION_PATTERN_RE = re.compile(r'^\*(\.[A-Za-z0-9]+)$')
+
+
+@lru_cache(maxsize=4096)
+def _compile_file_patterns(patterns: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Optional[Pattern[str]]]:
+    """applicable_filesを拡張子の一覧と、それ以外のglobをまとめた正規表現に分解"""
+    extensions = []
+    globs = []
+    for pattern in patterns:
+        match = _EXTENSION_PATTERN_RE.match(pattern)
+        if match:
+            extensions.append(match.group(1))
+        else:
+            globs.append(fnmatch.translate(pattern))
+    
+    glob_regex = re.compile("|".join(globs)) if globs else None
+    return tuple(extensions), glob_regex
+
+
+# メモリ割り当て関数の呼び出し
+_ALLOC_CALLS = ('malloc(', 'calloc(')
+
+# ループ内のメモリ割り当て検出に使うトークン（コメント・文字列リテラルは読み飛ばす）
+_LOOP_TOKEN_RE = re.compile(
+    r'(?P<skip>//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')'
+    r'|(?P<loop>\b(?:for|while)\s*\()'
+    r'|(?P<do>\bdo\b)'
+    r'|(?P<alloc>\b[mc]alloc\s*\()'
+    r'|(?P<punct>[{}();])',
+    re.DOTALL
+)
+
+# C/C++のソースとして扱う拡張子（小文字）
+_C_EXTS = frozenset({'.c', '.h', '.cc', '.cpp', '.cxx', '.hpp'})
+# C/C++の関数（strcpy, malloc など）を探す評価メソッド。その他の言語のファイルでは評価しない
+_C_ONLY_CHECKERS = frozenset({
+    "_check_buffer_overflow",
+    "_check_memory_leak",
+    "_check_null_pointer",
+    "_check_dangerous_functions",
+    "_check_performance"
+})
+
+# ルールの説明文に含まれるキーワードと評価メソッドの対応（上から順に判定し、最初に一致したものを使う）
+_RULE_CHECKERS = (
+    ("バッファオーバーフロー", "buffer overflow", "_check_buffer_overflow"),
+    ("メモリリーク", "memory leak", "_check_memory_leak"),
+    ("ヌル", "null", "_check_null_pointer"),
+    ("危険な関数", "dangerous function", "_check_dangerous_functions"),
+    ("エラーハンドリング", "error handling", "_check_error_handling"),
+    ("パフォーマンス", "performance", "_check_performance"),
+    ("コメント", "comment", "_check_comments")
+)
+
+
+@lru_cache(maxsize=4096)
+def _classify_rule(description: str) -> Optional[str]:
+    """説明文から評価メソッド名を決定（該当なしは汎用チェックとしてNone）"""
+    lowered = description.lower()
+    for keyword, english_keyword, checker in _RULE_CHECKERS:
+        if keyword in description or english_keyword in lowered:
+            return checker
+    return None
+
+
+def _find_alloc_in_loop(code: str) -> int:
+    """ループ本体の中にある最初のmalloc/calloc呼び出しの位置を取得（なければ-1）"""
+    brace_depth = 0
+    paren_depth = 0
+    # ループ本体の (種類, 波括弧の深さ)。種類は "block"（{...}）か "statement"（単文）
+    loop_bodies: List[Tuple[str, int]] = []
+    # ループ条件の "(" を開いた時点の括弧の深さ（条件の解析中でなければNone）
+    header_paren: Optional[int] = None
+    # ループ条件の直後（本体の開始待ち）かどうか
+    body_pending = False
+    
+    for match in _LOOP_TOKEN_RE.finditer(code):
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+        token = match.group()
+        
+        if body_pending and token != "{":
+            # 波括弧のないループ本体は次の ";" までの単文
+            loop_bodies.append(("statement", brace_depth))
+            body_pending = False
+        
+        if kind == "loop":
+            paren_depth += 1
+            if header_paren is None:
+                header_paren = paren_depth
+        elif kind == "do":
+            body_pending = True
+        elif kind == "alloc":
+            if loop_bodies:
+                return match.start()
+            paren_depth += 1
+        elif token == "(":
+            paren_depth += 1
+        elif token == ")":
+            if header_paren is not None and paren_depth == header_paren:
+                header_paren = None
+                body_pending = True
+            paren_depth = max(paren_depth - 1, 0)
+        elif token == "{":
+            brace_depth += 1
+            if body_pending:
+                loop_bodies.append(("block", brace_depth))
+                body_pending = False
+        elif token == "}":
+            # 閉じたブロックと、その中で終わっていない単文のループを取り除く
+            while loop_bodies and loop_bodies[-1][1] >= brace_depth:
+                loop_bodies.pop()
+            brace_depth = max(brace_depth - 1, 0)
+        elif token == ";" and paren_depth == 0:
+            # 単文のループ本体はここで終わる
+            while loop_bodies and loop_bodies[-1] == ("statement", brace_depth):
+                loop_bodies.pop()
+    
+    return -1
+
+
+@lru_cache(maxsize=4096)
+def _generic_keywords(description: str) -> Tuple[Tuple[str, str], ...]:
+    """汎用チェックで探すキーワード（4文字以上の語）と、その小文字形の一覧"""
+    return tuple((keyword, keyword.lower()) for keyword in description.split() if len(keyword) > 3)
+
+
 class ReviewRuleEngineTool(BaseTool):
     """レビュールールエンジンツール"""
     
@@ -21,27 +161,49 @@ class ReviewRuleEngineTool(BaseTool):
         super().__init__()
         self.config_manager = config_manager
         self.logger = logging.getLogger(__name__)
+        
+        # (レビュー観点の状態, 設定から取得したレビュー観点)
+        self._standards_snapshot: Optional[Tuple[Tuple[Optional[int], int], Dict[str, List[Dict]]]] = None
+        
+        # ファイルパスごとの適用ルール（レビュー観点が変わったら破棄）
+        self._applicable_cache: Dict[str, Dict[str, List[Dict]]] = {}
+        self._standards_key: Optional[Tuple[Optional[int], int]] = None
+        
+        # (ファイルパス, コード本文のハッシュ, カテゴリ, レビュー観点の状態) -> evaluate_file の結果JSON
+        self._eval_cache: Dict[Tuple[str, bytes, Optional[str], Tuple[Optional[int], int]], str] = {}
+        
+        # (レビュー観点の状態, list_all_rules の結果JSON)
+        self._list_all_cache: Optional[Tuple[Tuple[Optional[int], int], str]] = None
+        
+        # 直近に評価したコード本文と、その解析結果（項目名 -> 値）
+        self._code_scan: Optional[Tuple[str, Dict[str, Any]]] = None
     
-    def _run(self, action: str, file_path: str = None, code_content: str = None, rules_category: str = None) -> str:
+    def _run(self, action: str, file_path: str = None, code_content: str = None, rules_category: str = None,
+             files: List[Dict[str, str]] = None) -> str:
         """ルールエンジンを実行"""
         try:
             if action == "evaluate_file":
                 if not file_path or not code_content:
                     return json.dumps({"error": "file_path and code_content required"})
                 
-                result = self._evaluate_file(file_path, code_content, rules_category)
-                return json.dumps(result, ensure_ascii=False, indent=2)
+                return self._evaluate_file_json(file_path, code_content, rules_category)
+            
+            elif action == "evaluate_files":
+                if not files or not isinstance(files, list):
+                    return json.dumps({"error": "files required"})
+                
+                results = [self._evaluate_batch_entry(entry, rules_category) for entry in files]
+                return orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
             
             elif action == "get_applicable_rules":
                 if not file_path:
                     return json.dumps({"error": "file_path required"})
                 
                 rules = self._get_applicable_rules(file_path)
-                return json.dumps(rules, ensure_ascii=False, indent=2)
+                return orjson.dumps(rules, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
             
             elif action == "list_all_rules":
-                rules = self._list_all_rules()
-                return json.dumps(rules, ensure_ascii=False, indent=2)
+                return self._list_all_rules_json()
             
             else:
                 return json.dumps({"error": f"Unknown action: {action}"})
@@ -50,6 +212,39 @@ class ReviewRuleEngineTool(BaseTool):
             self.logger.error(f"Rule engine operation failed: {e}")
             return json.dumps({"error": str(e)})
     
+    def _evaluate_batch_entry(self, entry: Any, rules_category: str = None) -> Dict:
+        """evaluate_files の1件を評価（失敗した場合もバッチ全体は止めず、その件のエラーとして返す）"""
+        if not isinstance(entry, dict) or not entry.get("file_path") or not entry.get("code_content"):
+            file_path = entry.get("file_path") if isinstance(entry, dict) else None
+            return {"file_path": file_path, "error": "file_path and code_content required"}
+        
+        try:
+            # キャッシュ済みの結果を再利用し、配列全体は1回でシリアライズする
+            return orjson.loads(self._evaluate_file_json(entry["file_path"], entry["code_content"], rules_category))
+        except Exception as e:
+            self.logger.error(f"Rule evaluation failed for {entry['file_path']}: {e}")
+            return {"file_path": entry["file_path"], "error": str(e)}
+    
+    def _evaluate_file_json(self, file_path: str, code_content: str, rules_category: str = None) -> str:
+        """ファイルの評価結果をJSONで取得（同じ内容・同じレビュー観点ならシリアライズ済みの結果を再利用）"""
+        content_hash = hashlib.blake2b(code_content.encode('utf-8'), digest_size=16).digest()
+        standards_key = self._get_standards_key()
+        cached = self._eval_cache.get((file_path, content_hash, rules_category, standards_key))
+        if cached is not None:
+            return cached
+        
+        result = orjson.dumps(
+            self._evaluate_file(file_path, code_content, rules_category),
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ).decode()
+        
+        cache_key = (file_path, content_hash, rules_category, self._current_standards_key(standards_key[0]))
+        if len(self._eval_cache) >= EVAL_CACHE_SIZE:
+            # 最も古いエントリを破棄
+            del self._eval_cache[next(iter(self._eval_cache))]
+        self._eval_cache[cache_key] = result
+        return result
+    
     def _evaluate_file(self, file_path: str, code_content: str, rules_category: str = None) -> Dict:
         """ファイルに対してルールを評価"""
         # 適用可能なルールを取得
@@ -61,50 +256,97 @@ class ReviewRuleEngineTool(BaseTool):
                 rules_category: applicable_rules.get(rules_category, [])
             }
         
-        evaluation_result = {
-            "file_path": file_path,
-            "applied_rules": [],
-            "violations": [],
-            "summary": {
-                "total_rules": 0,
-                "violations_found": 0,
-                "compliance_score": 0.0
+        if not any(applicable_rules.values()):
+            # 適用するルールがなければコードを走査せずに結果を返す
+            return {
+                "file_path": file_path,
+                "applied_rules": [],
+                "violations": [],
+                "summary": {
+                    "total_rules": 0,
+                    "violations_found": 0,
+                    "compliance_score": 100.0
+                }
             }
-        }
         
-        total_rules = 0
-        violations = 0
+        applied_rules = []
+        violations = []
+        # 拡張子の判定はファイルごとに1回だけ行う
+        is_c_source = os.path.splitext(file_path)[1].lower() in _C_EXTS
         
         # カテゴリ別にルールを評価
         for category, rules in applicable_rules.items():
             for rule in rules:
-                total_rules += 1
-                evaluation_result["applied_rules"].append({
+                applied_rules.append({
                     "category": category,
                     "description": rule["description"],
                     "priority": rule["priority"]
                 })
                 
                 # ルールを評価
-                violation = self._evaluate_rule(rule, code_content, file_path)
+                violation = self._evaluate_rule(rule, code_content, file_path, is_c_source)
                 if violation:
-                    violations += 1
                     violation["category"] = category
-                    evaluation_result["violations"].append(violation)
+                    violations.append(violation)
+        
+        # 評価が終わったコード本文は保持しない
+        self._code_scan = None
         
         # サマリーを計算
-        evaluation_result["summary"]["total_rules"] = total_rules
-        evaluation_result["summary"]["violations_found"] = violations
-        evaluation_result["summary"]["compliance_score"] = (
-            (total_rules - violations) / total_rules * 100 if total_rules > 0 else 100.0
-        )
+        total_rules = len(applied_rules)
+        evaluation_result = {
+            "file_path": file_path,
+            "applied_rules": applied_rules,
+            "violations": violations,
+            "summary": {
+                "total_rules": total_rules,
+                "violations_found": len(violations),
+                "compliance_score": (total_rules - len(violations)) / total_rules * 100
+            }
+        }
         
         return evaluation_result
     
     def _get_applicable_rules(self, file_path: str) -> Dict[str, List[Dict]]:
-        """ファイルに適用可能なルールを取得"""
-        # 設定からレビュー観点を取得
-        standards = self.config_manager.get_review_standards()
+        """ファイルに適用可能なルールを取得（レビュー観点が変わらない間はファイルごとに結果を再利用）"""
+        standards_key = self._get_standards_key()
+        
+        if standards_key != self._standards_key:
+            self._applicable_cache.clear()
+            self._standards_key = standards_key
+        
+        applicable_rules = self._applicable_cache.get(file_path)
+        if applicable_rules is None:
+            applicable_rules = self._collect_applicable_rules(file_path)
+            self._applicable_cache[file_path] = applicable_rules
+            self._standards_key = self._current_standards_key(standards_key[0])
+        
+        return applicable_rules
+    
+    def _get_standards(self) -> Dict[str, List[Dict]]:
+        """レビュー観点を取得（設定からのコピーは変更されたときのみ取り直し、呼び出し側で変更しないこと）"""
+        standards_key = self._get_standards_key()
+        if self._standards_snapshot is None or self._standards_snapshot[0] != standards_key:
+            standards = self.config_manager.get_review_standards()
+            self._standards_snapshot = (self._current_standards_key(standards_key[0]), standards)
+        return self._standards_snapshot[1]
+    
+    def _get_standards_key(self) -> Tuple[Optional[int], int]:
+        """レビュー観点の状態を表すキー（ファイルの更新時刻と設定のバージョン番号）"""
+        try:
+            mtime: Optional[int] = self.config_manager.review_standards_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        return self._current_standards_key(mtime)
+    
+    def _current_standards_key(self, mtime: Optional[int]) -> Tuple[Optional[int], int]:
+        """確認済みの更新時刻と現在の設定バージョンからレビュー観点の状態を表すキーを作成"""
+        # キャッシュへの登録時は計算中の読み込みで進んだバージョンを含めて記録し、次回の呼び出しで無駄に破棄しないようにする
+        return (mtime, self.config_manager.get_version())
+    
+    def _collect_applicable_rules(self, file_path: str) -> Dict[str, List[Dict]]:
+        """レビュー観点の全ルールを走査して、ファイルに適用可能なルールを抽出"""
+        standards = self._get_standards()
         
         if not standards:
             return {}
@@ -128,48 +370,63 @@ class ReviewRuleEngineTool(BaseTool):
         return applicable_rules
     
     def _file_matches_patterns(self, file_path: str, patterns: List[str]) -> bool:
-        """ファイルがパターンにマッチするかチェック"""
-        import fnmatch
+        """ファイルがパターンにマッチするかチェック（拡張子指定は正規表現を使わず末尾一致で判定）"""
+        extensions, glob_regex = _compile_file_patterns(tuple(patterns))
         
-        for pattern in patterns:
-            if fnmatch.fnmatch(file_path, pattern):
-                return True
-        return False
+        if file_path.endswith(extensions):
+            return True
+        return glob_regex is not None and glob_regex.match(file_path) is not None
     
-    def _evaluate_rule(self, rule: Dict, code_content: str, file_path: str) -> Optional[Dict]:
+    def _evaluate_rule(self, rule: Dict, code_content: str, file_path: str, is_c_source: bool = True) -> Optional[Dict]:
         """個別ルールを評価"""
         description = rule["description"]
-        category = rule.get("category", "custom")
-        
-        # ルールの説明文から評価ロジックを決定
-        violation = None
-        
-        if "バッファオーバーフロー" in description or "buffer overflow" in description.lower():
-            violation = self._check_buffer_overflow(code_content, description)
-        
-        elif "メモリリーク" in description or "memory leak" in description.lower():
-            violation = self._check_memory_leak(code_content, description)
-        
-        elif "null" in description.lower() or "ヌル" in description:
-            violation = self._check_null_pointer(code_content, description)
-        
-        elif "危険な関数" in description or "dangerous function" in description.lower():
-            violation = self._check_dangerous_functions(code_content, description)
-        
-        elif "エラーハンドリング" in description or "error handling" in description.lower():
-            violation = self._check_error_handling(code_content, description)
-        
-        elif "パフォーマンス" in description or "performance" in description.lower():
-            violation = self._check_performance(code_content, description)
         
-        elif "コメント" in description or "comment" in description.lower():
-            violation = self._check_comments(code_content, description)
-        
-        else:
+        # 説明文の分類は説明文ごとに1回だけ行い、以降は対応する評価メソッドを直接呼ぶ
+        checker = _classify_rule(description)
+        if checker is None:
             # 汎用的なキーワードマッチング
-            violation = self._check_generic_rule(rule, code_content, description)
+            return self._check_generic_rule(rule, code_content, description)
+        
+        if checker in _C_ONLY_CHECKERS and not is_c_source:
+            # C/C++以外のファイルでは該当する関数が存在しないため評価を省略
+            return None
         
-        return violation
+        return getattr(self, checker)(code_content, description)
+    
+    def _scan_code(self, code: str, name: str, compute: Callable[[str], Any]) -> Any:
+        """コード本文の解析結果を必要になった項目だけ計算し、同じ本文に対する各ルールの評価で再利用"""
+        if self._code_scan is None or self._code_scan[0] is not code:
+            self._code_scan = (code, {})
+        values = self._code_scan[1]
+        if name not in values:
+            values[name] = compute(code)
+        return values[name]
+    
+    def _code_lines(self, code: str) -> List[str]:
+        """コード本文を行に分割"""
+        return self._scan_code(code, "lines", lambda text: text.split('\n'))
+    
+    def _code_line_starts(self, code: str) -> List[int]:
+        """各行の先頭位置（末尾に本文の長さ+1を含む）"""
+        return self._scan_code(
+            code, "line_starts",
+            lambda text: list(accumulate((len(line) + 1 for line in self._code_lines(text)), initial=0))
+        )
+    
+    def _count_in_code(self, code: str, token: str) -> int:
+        """コード本文に含まれるトークンの数"""
+        return self._scan_code(code, "count:" + token, lambda text: text.count(token))
+    
+    def _token_lines(self, code: str, tokens: Tuple[str, ...]) -> List[int]:
+        """いずれかのトークンを含む行の番号（0始まり）を、出現位置から求めて昇順で取得"""
+        line_starts = self._code_line_starts(code)
+        line_indexes = set()
+        for token in tokens:
+            pos = code.find(token)
+            while pos != -1:
+                line_indexes.add(bisect_right(line_starts, pos) - 1)
+                pos = code.find(token, pos + len(token))
+        return sorted(line_indexes)
     
     def _check_buffer_overflow(self, code: str, description: str) -> Optional[Dict]:
         """バッファオーバーフロー脆弱性をチェック"""
@@ -189,8 +446,8 @@ class ReviewRuleEngineTool(BaseTool):
     
     def _check_memory_leak(self, code: str, description: str) -> Optional[Dict]:
         """メモリリークをチェック"""
-        malloc_count = code.count('malloc') + code.count('calloc')
-        free_count = code.count('free')
+        malloc_count = self._count_in_code(code, 'malloc') + self._count_in_code(code, 'calloc')
+        free_count = self._count_in_code(code, 'free')
         
         if malloc_count > free_count:
             return {
@@ -205,16 +462,14 @@ class ReviewRuleEngineTool(BaseTool):
     
     def _check_null_pointer(self, code: str, description: str) -> Optional[Dict]:
         """NULLポインタチェック"""
-        lines = code.split('\n')
+        lines = self._code_lines(code)
         
-        for i, line in enumerate(lines):
-            if ('malloc(' in line or 'calloc(' in line) and '=' in line:
+        # 全行を走査せず、malloc/callocを含む行だけを確認
+        for i in self._token_lines(code, _ALLOC_CALLS):
+            line = lines[i]
+            if '=' in line:
                 # 次の数行でNULLチェックがあるか確認
-                null_check_found = False
-                for j in range(i + 1, min(i + 5, len(lines))):
-                    if 'NULL' in lines[j] or 'null' in lines[j]:
-                        null_check_found = True
-                        break
+                null_check_found = any('NULL' in next_line or 'null' in next_line for next_line in lines[i + 1:i + 5])
                 
                 if not null_check_found:
                     return {
@@ -264,32 +519,29 @@ class ReviewRuleEngineTool(BaseTool):
     
     def _check_performance(self, code: str, description: str) -> Optional[Dict]:
         """パフォーマンス問題をチェック"""
-        # ループ内でのmalloc検出
-        lines = code.split('\n')
-        in_loop = False
-        
-        for i, line in enumerate(lines):
-            if any(keyword in line for keyword in ['for(', 'while(', 'do{']):
-                in_loop = True
-            elif '}' in line:
-                in_loop = False
-            
-            if in_loop and ('malloc(' in line or 'calloc(' in line):
-                return {
-                    "rule_description": description,
-                    "violation_type": "performance",
-                    "severity": "medium",
-                    "message": "ループ内でメモリ割り当てを実行",
-                    "suggestion": "可能であればループ外でメモリを事前割り当てしてください",
-                    "line_number": i + 1,
-                    "detected_pattern": line.strip()
-                }
+        # ループ内でのmalloc検出（波括弧・括弧の対応を追って、ネストしたブロックや単文のループ本体も判定）
+        pos = _find_alloc_in_loop(code)
+        
+        if pos != -1:
+            line_start = code.rfind('\n', 0, pos) + 1
+            line_end = code.find('\n', pos)
+            line = code[line_start:line_end if line_end != -1 else len(code)]
+            return {
+                "rule_description": description,
+                "violation_type": "performance",
+                "severity": "medium",
+                "message": "ループ内でメモリ割り当てを実行",
+                "suggestion": "可能であればループ外でメモリを事前割り当てしてください",
+                "line_number": code.count('\n', 0, pos) + 1,
+                "detected_pattern": line.strip()
+            }
         return None
     
     def _check_comments(self, code: str, description: str) -> Optional[Dict]:
         """コメントの有無をチェック"""
-        comment_count = code.count('//') + code.count('/*')
-        line_count = len(code.split('\n'))
+        comment_count = self._count_in_code(code, '//') + self._count_in_code(code, '/*')
+        # 行のリストを作らずに改行の数から行数を求める
+        line_count = self._count_in_code(code, '\n') + 1
         
         if line_count > 20 and comment_count == 0:
             return {
@@ -304,11 +556,16 @@ class ReviewRuleEngineTool(BaseTool):
     
     def _check_generic_rule(self, rule: Dict, code: str, description: str) -> Optional[Dict]:
         """汎用的なルールチェック"""
-        # 簡易的なキーワードベースのチェック
-        keywords = description.split()
-        
-        for keyword in keywords:
-            if len(keyword) > 3 and keyword.lower() in code.lower():
+        # 簡易的なキーワードベースのチェック（同じキーワードの検索はファイルごとに1回だけ）
+        lowered_code = self._scan_code(code, "lowered", str.lower)
+        # キーワード（小文字） -> コード中に含まれるか
+        keyword_hits = self._scan_code(code, "keyword_hits", lambda text: {})
+        
+        for keyword, lowered_keyword in _generic_keywords(description):
+            found = keyword_hits.get(lowered_keyword)
+            if found is None:
+                found = keyword_hits[lowered_keyword] = lowered_keyword in lowered_code
+            if found:
                 return {
                     "rule_description": description,
                     "violation_type": "generic",
@@ -319,9 +576,19 @@ class ReviewRuleEngineTool(BaseTool):
                 }
         return None
     
+    def _list_all_rules_json(self) -> str:
+        """全ルールの一覧をJSONで取得（レビュー観点が変わらない間はシリアライズ済みの結果を再利用）"""
+        standards_key = self._get_standards_key()
+        if self._list_all_cache is not None and self._list_all_cache[0] == standards_key:
+            return self._list_all_cache[1]
+        
+        result = orjson.dumps(self._list_all_rules(), option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+        self._list_all_cache = (self._current_standards_key(standards_key[0]), result)
+        return result
+    
     def _list_all_rules(self) -> Dict:
         """全てのルールを一覧表示"""
-        standards = self.config_manager.get_review_standards()
+        standards = self._get_standards()
         
         if not standards:
             return {"message": "No rules configured"}